@@ -9,6 +9,7 @@ import msc_i18n as i18n
 import time
 import random
 import msc_config as config
+import msc_radar as radar_codec
 from datetime import datetime
 
 # ==========================================
@@ -206,30 +207,28 @@ def daily_insight_dialog(username, radar):
 @st.dialog("📦 MEANING BOX", width="large")
 def meaning_box_dialog(username):
     nodes = msc.get_all_nodes_for_map(username)
+    # 冷存储中的历史卡片：仅在打开意义盒子时读取
+    hot_ids = {n.id for n in nodes}
+    nodes = nodes + [n for n in msc.get_archived_nodes(username) if n.id not in hot_ids]
     if not nodes:
         st.info("No meaning collected yet.")
         return
         
-    nodes = sorted(nodes, key=lambda x: x['id'], reverse=True)
+    nodes = sorted(nodes, key=lambda x: x.id, reverse=True)
     st.caption(f"Total Cards: {len(nodes)}")
     
     for n in nodes:
         with st.container(border=True):
-            ts = n.get('created_at', '')[:16].replace('T', ' ')
             c1, c2 = st.columns([0.2, 0.8])
             with c1:
-                st.caption(ts)
-                kw = n.get('keywords', [])
-                if isinstance(kw, str):
-                    try: kw = json.loads(kw)
-                    except: kw = []
-                if kw:
-                    st.markdown(f"**#{kw[0]}**")
+                st.caption(n.created_label)
+                if n.primary_keyword:
+                    st.markdown(f"**#{n.primary_keyword}**")
             with c2:
-                st.markdown(f"#### {n.get('care_point', 'Unknown')}")
-                st.info(n.get('insight', ''))
+                st.markdown(f"#### {n.care_point or 'Unknown'}")
+                st.info(n.insight)
                 with st.expander("Original Context / 原文"):
-                    st.write(n.get('content', ''))
+                    st.write(n.content)
 
 # 🟢 安装说明弹窗
 @st.dialog("📱 Install to Home Screen")
@@ -267,9 +266,9 @@ if not st.session_state.logged_in:
 else:
     msc.update_heartbeat(st.session_state.username)
     
-    # 获取用户数据
-    my_nodes_list = list(msc.get_active_nodes_map(st.session_state.username).values())
-    node_count = len(my_nodes_list)
+    # 获取用户数据 (一次并发往返)
+    boot = msc.get_session_bootstrap(st.session_state.username)
+    node_count = boot["node_count"]
     
     if node_count == 0 and not st.session_state.is_admin and "onboarding_complete" not in st.session_state:
         pages.render_onboarding(st.session_state.username)
@@ -278,11 +277,11 @@ else:
     if node_count == 0 and not st.session_state.is_admin:
         check_and_send_first_contact(st.session_state.username)
         
-    user_profile = msc.get_user_profile(st.session_state.username)
-    raw_radar = user_profile.get('radar_profile')
-    radar_dict = json.loads(raw_radar) if isinstance(raw_radar, str) else (raw_radar or {k:3.0 for k in config.RADAR_AXES})
+    user_profile = boot["profile"]
+    radar_vec = radar_codec.to_vector(user_profile.get('radar_profile'))
     
-    total_unread, unread_counts = msc.get_unread_counts(st.session_state.username)
+    inbox = boot["inbox"]
+    total_unread = inbox["total_unread"]
     lang = st.session_state.language
     
     MENU_TEXT = {
@@ -295,7 +294,7 @@ else:
     with st.sidebar:
         c_av, c_info = st.columns([0.25, 0.75])
         with c_av:
-            rank_name, rank_icon = msc.calculate_rank(radar_dict)
+            rank_name, rank_icon = msc.calculate_rank(radar_vec)
             st.markdown(f"<div style='font-size:24px; text-align:center;'>{rank_icon}</div>", unsafe_allow_html=True)
         with c_info:
             st.markdown(f"**{st.session_state.nickname}**")
@@ -306,13 +305,14 @@ else:
         col_btn1, col_btn2 = st.columns(2)
         with col_btn1:
             if st.button(f"⚡ {T['Ins']}", use_container_width=True):
-                daily_insight_dialog(st.session_state.username, radar_dict)
+                daily_insight_dialog(st.session_state.username, radar_vec)
         with col_btn2:
             if st.button(f"📦 {T['Box']}", use_container_width=True):
                 meaning_box_dialog(st.session_state.username)
         
         st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
-        soul_viz.render_soul_scene(radar_dict, my_nodes_list)
+        my_nodes_list = boot["nodes"] if node_count else []
+        soul_viz.render_soul_scene(radar_vec, my_nodes_list)
         st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
         st.divider()
         
@@ -358,7 +358,7 @@ else:
     elif selected_menu == T['AI']:
         pages.render_ai_page(st.session_state.username)
     elif selected_menu == T['Chat']:
-        pages.render_friends_page(st.session_state.username, unread_counts)
+        pages.render_friends_page(st.session_state.username, inbox)
     elif selected_menu == T['World']:
         pages.render_world_page()
     elif selected_menu == T['God']:
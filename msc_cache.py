@@ -0,0 +1,402 @@
+import os
+import time
+import json
+import uuid
+import pickle
+import sqlite3
+import inspect
+import threading
+import functools
+from collections import OrderedDict, deque
+
+# ==========================================
+# 🗄️ 键级缓存 (Key-scoped Cache)
+# ==========================================
+# 与 st.cache_data 用法一致 (@cached(ttl=60), func.clear())，另外支持：
+#   func.clear(username)          只清除参数匹配的条目 (部分参数即可)
+#   func.update(fn, username)     原地改写本进程的匹配条目: value = fn(value, params)
+# 返回值不做拷贝，调用方不要修改；update 请返回新对象 (copy-on-write)
+#
+# 两级结构：L1 = 进程内字典；L2 = 可插拔的共享后端 (SQLite 文件 / Redis)
+# 多 worker 部署时 L2 让各进程共享读结果，clear/update 通过失效消息同步到其它进程的 L1
+# L2 条目按第一个参数 (通常是 username) 分组：clear / update 按精确键或分组直接删除，不扫描整个命名空间
+# update 只改写 L1；L2 中的匹配条目被删除而不是读改写 (多个进程同时追加时不会互相覆盖)
+
+PROCESS_ID = uuid.uuid4().hex
+POLL_INTERVAL = 0.5  # 秒：拉取其它进程失效消息的最小间隔
+PURGE_INTERVAL = 30  # 秒：L1 写入时清理过期条目的最小间隔
+
+_backend = None
+_registry = {}
+_poll_state = {"last": 0.0}
+_poll_lock = threading.Lock()
+_local_limit = {"max_entries": 1000}  # L1 每个函数的默认条目上限 (LRU)；@cached(max_entries=...) 可单独指定
+
+def _key_text(key):
+    return json.dumps(list(key), default=str, ensure_ascii=False)
+
+def _scope_text(key):
+    """L2 分组：第一个参数的值；无参数函数为空串"""
+    return json.dumps(key[0], default=str, ensure_ascii=False) if key else ""
+
+class CachedFunction:
+    def __init__(self, func, ttl=None, max_entries=None):
+        self._func = func
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._signature = inspect.signature(func)
+        self._names = list(self._signature.parameters)
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._purged_at = 0.0
+        self._lock = threading.Lock()
+        self.namespace = f"{func.__module__}.{func.__qualname__}"
+        _registry[self.namespace] = self
+
+    def _key(self, args, kwargs):
+        bound = self._signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return tuple(bound.arguments[name] for name in self._names)
+
+    def _wanted(self, args, kwargs):
+        return dict(self._signature.bind_partial(*args, **kwargs).arguments)
+
+    def _l2_target(self, wanted):
+        """wanted → L2 删除范围 (scope, key)：全部参数给定 → 精确键；给定第一个参数 → 该分组；否则整个命名空间"""
+        if not self._names or not wanted: return None, None
+        if len(wanted) == len(self._names):
+            key = tuple(wanted[name] for name in self._names)
+            return _scope_text(key), _key_text(key)
+        if self._names[0] in wanted: return _scope_text((wanted[self._names[0]],)), None
+        return None, None
+
+    def _evict_shared(self, wanted):
+        if _backend is None: return
+        try:
+            scope, key = self._l2_target(wanted)
+            _backend.delete(self.namespace, scope, key)
+            _backend.publish(self.namespace, wanted)
+        except Exception as e: print(f"Cache Backend Error: {e}")
+
+    def _matcher(self, wanted):
+        positions = [(self._names.index(name), value) for name, value in wanted.items()]
+        return lambda key: all(key[i] == value for i, value in positions)
+
+    def _store_local(self, key, expires_at, value):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            if now - self._purged_at > PURGE_INTERVAL:
+                self._purged_at = now
+                for k in [k for k, (exp, _) in self._entries.items() if exp <= now]: del self._entries[k]
+            limit = self._max_entries or _local_limit["max_entries"]
+            while len(self._entries) > limit: self._entries.popitem(last=False)
+
+    def __call__(self, *args, **kwargs):
+        key = self._key(args, kwargs)
+        memo = _request_memo()
+        if memo is not None:
+            memo_key = (self.namespace, key)
+            memo["stats"]["calls"] += 1
+            request_stats["calls"] += 1
+            if memo_key in memo["values"]:
+                memo["stats"]["hits"] += 1
+                request_stats["hits"] += 1
+                return memo["values"][memo_key]
+            value = self._lookup(key, args, kwargs)
+            memo["values"][memo_key] = value
+            return value
+        return self._lookup(key, args, kwargs)
+
+    def _lookup(self, key, args, kwargs):
+        _poll_invalidations()
+        now = time.time()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] > now:
+                self._entries.move_to_end(key)
+                return hit[1]
+
+        if _backend is not None:
+            try:
+                found, value, expires_at = _backend.get(self.namespace, _key_text(key))
+                if found and expires_at > now:
+                    self._store_local(key, expires_at, value)
+                    return value
+            except Exception as e: print(f"Cache Backend Error: {e}")
+
+        value = self._func(*args, **kwargs)
+        expires_at = now + self._ttl if self._ttl else float('inf')
+        self._store_local(key, expires_at, value)
+        if _backend is not None:
+            try: _backend.set(self.namespace, _key_text(key), value, expires_at, _scope_text(key))
+            except Exception as e: print(f"Cache Backend Error: {e}")
+        return value
+
+    def peek(self, *args, **kwargs):
+        """只查 L1 / L2，不执行函数：返回 (found, value) (异步层先查缓存再决定是否走网络)"""
+        key = self._key(args, kwargs)
+        _poll_invalidations()
+        now = time.time()
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] > now: return True, hit[1]
+        if _backend is not None:
+            try:
+                found, value, expires_at = _backend.get(self.namespace, _key_text(key))
+                if found and expires_at > now:
+                    self._store_local(key, expires_at, value)
+                    return True, value
+            except Exception as e: print(f"Cache Backend Error: {e}")
+        return False, None
+
+    def put(self, value, *args, **kwargs):
+        """把别处取得的结果写入缓存 (与正常调用相同的键和 TTL)"""
+        key = self._key(args, kwargs)
+        expires_at = time.time() + self._ttl if self._ttl else float('inf')
+        self._store_local(key, expires_at, value)
+        if _backend is not None:
+            try: _backend.set(self.namespace, _key_text(key), value, expires_at, _scope_text(key))
+            except Exception as e: print(f"Cache Backend Error: {e}")
+
+    def _clear_local(self, wanted):
+        with self._lock:
+            if not wanted:
+                self._entries.clear()
+                return
+            match = self._matcher(wanted)
+            for key in [k for k in self._entries if match(k)]: del self._entries[key]
+
+    def clear(self, *args, **kwargs):
+        wanted = self._wanted(args, kwargs)
+        self._clear_local(wanted)
+        _forget_request_memo(self.namespace)
+        self._evict_shared(wanted)
+
+    def update(self, fn, *args, **kwargs):
+        """对本进程 L1 中匹配的未过期条目执行 value = fn(value, params)，返回改写条数；L2 与其它进程的匹配条目被失效"""
+        wanted = self._wanted(args, kwargs)
+        match = self._matcher(wanted)
+        now = time.time()
+        updated = 0
+        _forget_request_memo(self.namespace)
+        with self._lock:
+            for key, (expires_at, value) in list(self._entries.items()):
+                if expires_at <= now or not match(key): continue
+                self._entries[key] = (expires_at, fn(value, dict(zip(self._names, key))))
+                updated += 1
+        self._evict_shared(wanted)
+        return updated
+
+# ==========================================
+# 🧾 请求级记忆 (Request Memo)
+# ==========================================
+# 同一次脚本运行 (rerun) 内，相同参数的读取只执行一次，直接返回同一个对象 (不拷贝、不查 L1/L2)
+# scope() 返回标识"当前运行"的对象；返回 None 时不做记忆 (后台线程等)
+# 本线程内的 clear/update (即写操作) 会丢弃该函数的记忆，保证写后读到新值
+
+_request_scope = None
+_memo_local = threading.local()
+request_stats = {"runs": 0, "calls": 0, "hits": 0}
+
+def set_local_limit(max_entries):
+    """L1 默认条目上限 (每个 @cached 函数各自计数)"""
+    if max_entries: _local_limit["max_entries"] = int(max_entries)
+
+def set_request_scope(scope):
+    global _request_scope
+    _request_scope = scope
+
+def _request_memo():
+    if _request_scope is None: return None
+    try: token = _request_scope()
+    except: token = None
+    if token is None: return None
+    memo = getattr(_memo_local, "memo", None)
+    if memo is None or memo["token"] is not token:
+        memo = _memo_local.memo = {"token": token, "values": {}, "stats": {"calls": 0, "hits": 0}}
+        request_stats["runs"] += 1
+    return memo
+
+def _forget_request_memo(namespace):
+    memo = getattr(_memo_local, "memo", None)
+    if memo is None: return
+    for key in [k for k in memo["values"] if k[0] == namespace]: del memo["values"][key]
+
+def current_request_stats():
+    """本次运行：记忆层收到的调用数 / 被吸收的重复调用数"""
+    memo = getattr(_memo_local, "memo", None)
+    return dict(memo["stats"]) if memo else {"calls": 0, "hits": 0}
+
+def cached(ttl=None, max_entries=None):
+    def decorator(func):
+        return functools.update_wrapper(CachedFunction(func, ttl, max_entries), func)
+    return decorator
+
+def _poll_invalidations():
+    """应用其它进程发来的失效消息：清掉本进程 L1 中对应条目，下次从 L2 读取新值"""
+    if _backend is None: return
+    now = time.time()
+    with _poll_lock:
+        if now - _poll_state["last"] < POLL_INTERVAL: return
+        _poll_state["last"] = now
+    try:
+        for namespace, wanted in _backend.poll():
+            func = _registry.get(namespace)
+            if func is not None: func._clear_local(wanted)
+    except Exception as e: print(f"Cache Backend Error: {e}")
+
+# ==========================================
+# 🔌 L2 后端 (Shared Backends)
+# ==========================================
+# 接口: get(ns, key) -> (found, value, expires_at) | set(ns, key, value, expires_at, scope)
+#       delete(ns, scope=None, key=None)：给定 key 删精确键，只给 scope 删该分组，都不给删整个命名空间
+#       publish(ns, wanted) | poll() -> [(ns, wanted)] (仅其它进程的消息)
+
+class SQLiteBackend:
+    """同一台机器上的多进程共享：WAL 模式的 SQLite 文件，失效消息写入事件表并按序号轮询"""
+    EVENT_RETENTION = 300  # 秒
+
+    def __init__(self, path, max_entries=5000):
+        self._path = path
+        self._max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        self._last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM cache_events").fetchone()[0]
+        self._seq_lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if os.path.dirname(self._path): os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_entries (ns TEXT, key TEXT, value BLOB, expires_at REAL, touched_at REAL, scope TEXT, PRIMARY KEY (ns, key))")
+            try: conn.execute("ALTER TABLE cache_entries ADD COLUMN scope TEXT")  # 旧版缓存文件
+            except sqlite3.OperationalError: pass
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_touched ON cache_entries (touched_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_scope ON cache_entries (ns, scope)")
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_events (seq INTEGER PRIMARY KEY AUTOINCREMENT, ns TEXT, wanted TEXT, origin TEXT, created_at REAL)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, ns, key):
+        row = self._conn().execute("SELECT value, expires_at FROM cache_entries WHERE ns = ? AND key = ?", (ns, key)).fetchone()
+        if row is None: return False, None, 0.0
+        return True, pickle.loads(row[0]), row[1]
+
+    def set(self, ns, key, value, expires_at, scope=""):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO cache_entries (ns, key, value, expires_at, touched_at, scope) VALUES (?, ?, ?, ?, ?, ?)",
+                     (ns, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), expires_at, now, scope))
+        self._writes += 1
+        if self._writes % 100 == 0: self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM cache_events WHERE created_at < ?", (now - self.EVENT_RETENTION,))
+        overflow = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self._max_entries
+        if overflow > 0:
+            conn.execute("DELETE FROM cache_entries WHERE rowid IN (SELECT rowid FROM cache_entries ORDER BY touched_at LIMIT ?)", (overflow,))
+
+    def delete(self, ns, scope=None, key=None):
+        if key is not None: self._conn().execute("DELETE FROM cache_entries WHERE ns = ? AND key = ?", (ns, key))
+        elif scope is not None: self._conn().execute("DELETE FROM cache_entries WHERE ns = ? AND scope = ?", (ns, scope))
+        else: self._conn().execute("DELETE FROM cache_entries WHERE ns = ?", (ns,))
+
+    def publish(self, ns, wanted):
+        self._conn().execute("INSERT INTO cache_events (ns, wanted, origin, created_at) VALUES (?, ?, ?, ?)",
+                             (ns, json.dumps(wanted, default=str), PROCESS_ID, time.time()))
+
+    def poll(self):
+        with self._seq_lock:
+            rows = self._conn().execute("SELECT seq, ns, wanted, origin FROM cache_events WHERE seq > ? ORDER BY seq", (self._last_seq,)).fetchall()
+            if rows: self._last_seq = rows[-1][0]
+        return [(ns, json.loads(wanted)) for _, ns, wanted, origin in rows if origin != PROCESS_ID]
+
+class RedisBackend:
+    """
+    跨机器共享：值用 SET EX 存储 (容量上限交给 Redis 的 maxmemory-policy)，失效消息走 pub/sub
+    每个分组 / 命名空间另有一个键名集合，删除时直接取成员，不做 SCAN
+    """
+
+    def __init__(self, url, prefix="msc:cache:"):
+        import redis  # 可选依赖：pip install redis
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._channel = prefix + "invalidate"
+        self._inbox = deque(maxlen=10000)
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._channel: self._on_message})
+        self._listener = pubsub.run_in_thread(sleep_time=0.1, daemon=True)
+
+    def _name(self, ns, key): return f"{self._prefix}{ns}:{key}"
+    def _scope_set(self, ns, scope): return f"{self._prefix}@scope:{ns}:{scope}"
+    def _ns_set(self, ns): return f"{self._prefix}@ns:{ns}"
+
+    def _on_message(self, message):
+        try:
+            msg = json.loads(message['data'])
+            if msg['origin'] != PROCESS_ID: self._inbox.append((msg['ns'], msg['wanted']))
+        except: pass
+
+    def get(self, ns, key):
+        raw = self._redis.get(self._name(ns, key))
+        if raw is None: return False, None, 0.0
+        expires_at, value = pickle.loads(raw)
+        return True, value, expires_at
+
+    def set(self, ns, key, value, expires_at, scope=""):
+        ttl = None if expires_at == float('inf') else max(1, int(expires_at - time.time()) + 1)
+        name = self._name(ns, key)
+        scope_set, ns_set = self._scope_set(ns, scope), self._ns_set(ns)
+        pipe = self._redis.pipeline()
+        pipe.set(name, pickle.dumps((expires_at, value), protocol=pickle.HIGHEST_PROTOCOL), ex=ttl)
+        pipe.sadd(scope_set, name)
+        pipe.sadd(ns_set, name, scope_set)  # 命名空间集合也登记分组集合，整体删除时一并删掉
+        for index in (scope_set, ns_set):
+            # 集合的 TTL 跟随最晚过期的成员：没有 TTL 的新集合 GT 不生效，先 NX 设置再 GT 延长
+            # 同一函数的 TTL 固定，永久条目 (ttl=None) 与限时条目不会落在同一个集合里
+            if ttl:
+                pipe.expire(index, ttl, nx=True)
+                pipe.expire(index, ttl, gt=True)
+            else: pipe.persist(index)
+        pipe.execute()
+
+    def delete(self, ns, scope=None, key=None):
+        ns_set = self._ns_set(ns)
+        pipe = self._redis.pipeline()
+        if key is not None:
+            name = self._name(ns, key)
+            pipe.delete(name)
+            pipe.srem(ns_set, name)
+            if scope is not None: pipe.srem(self._scope_set(ns, scope), name)
+        elif scope is not None:
+            index = self._scope_set(ns, scope)
+            names = list(self._redis.smembers(index))
+            pipe.delete(index, *names)
+            pipe.srem(ns_set, index, *names)
+        else:
+            pipe.delete(ns_set, *self._redis.smembers(ns_set))
+        pipe.execute()
+
+    def publish(self, ns, wanted):
+        self._redis.publish(self._channel, json.dumps({"ns": ns, "wanted": wanted, "origin": PROCESS_ID}, default=str))
+
+    def poll(self):
+        out = []
+        while self._inbox: out.append(self._inbox.popleft())
+        return out
+
+def make_backend(kind, url=None, path=None, max_entries=5000):
+    """kind: memory (仅 L1) / sqlite / redis"""
+    if kind == "sqlite": return SQLiteBackend(path, max_entries=max_entries)
+    if kind == "redis": return RedisBackend(url)
+    return None
+
+def configure(backend):
+    global _backend
+    _backend = backend
@@ -30,10 +30,39 @@ W_MEANING = { "Cognitive_Density": 0.35, "Structural_Tension": 0.30, "Subjective
 LEVELS = { "Noise": 0.25, "Signal": 0.40, "Structure": 0.75, "Core": 0.92 }
 LINK_THRESHOLD = {"Weak": 0.55, "Strong": 0.78}
 RADAR_ALPHA = 0.12
+RADAR_CAS_RETRIES = 5   # 未安装雷达 RPC 时乐观锁的最大重试次数
 HEARTBEAT_TIMEOUT = 300
+HEARTBEAT_FLUSH_SECONDS = 60   # 心跳合并写入间隔 (需远小于 HEARTBEAT_TIMEOUT)
 WORLD_UNLOCK_THRESHOLD = 20 
 TTL_ACTIVE = 24    
 TTL_SEDIMENT = 720 
+EMBEDDING_DTYPE = "float32"   # 向量存储格式: float32 / float16 (base64 二进制)
+EMBEDDING_PRECISION = "float32"   # 内存分析精度: float32 / float16 / int8 (量化后可常驻全量节点)
+CACHE_BACKEND = "memory"   # 共享缓存层: memory (仅进程内) / sqlite (同机多进程) / redis (多机，需 REDIS_URL)
+CACHE_SQLITE_PATH = "/tmp/msc_cache.sqlite3"
+CACHE_MAX_ENTRIES = 5000
+CACHE_L1_MAX_ENTRIES = 1000   # 进程内缓存：每个函数的条目上限 (LRU，过期条目写入时清理)
+LOG_QUEUE_SIZE = 5000        # 日志管道：内存队列上限 (满则丢弃并计数)
+LOG_BATCH_SIZE = 100
+LOG_FLUSH_INTERVAL = 2.0     # 秒
+LOG_SAMPLE_RATES = {"DEBUG": 0.1, "INFO": 1.0, "WARN": 1.0, "ERROR": 1.0}
+DB_POOL_SIZE = 4                 # 客户端池大小 (每个客户端一个 keep-alive 连接池)
+DB_CONNECTIONS_PER_CLIENT = 4
+DB_CONNECT_TIMEOUT = 3.0         # 秒
+DB_CALL_TIMEOUT = 8.0            # 秒：单次请求超时
+DB_DEADLINE = 15.0               # 秒：含重试的总时间预算
+DB_READ_RETRIES = 2              # 幂等调用最多重试次数 (指数退避 + 抖动)
+STORAGE_BACKEND = "supabase"     # 存储后端: supabase / sqlite (本地 WAL 文件，离线测试 / 单机部署)
+STORE_SQLITE_PATH = "/tmp/msc_store.sqlite3"
+DM_PAGE_SIZE = 50                # 私信每页条数 (keyset 分页)
+DM_CATCHUP_PAGES = 5             # 私信增量追赶的最大页数，超过后直接重取最新一页
+CHAT_PAGE_SIZE = 30              # AI 对话每页条数 (也是缓存尾部长度)
+CHAT_CONTEXT_SIZE = 20           # 发送给模型的最近消息条数
+INBOX_RESYNC_SECONDS = 300       # 收件箱增量同步：每隔多久做一次全量校准 (其它设备已读等)
+PUSH_REALTIME = True             # 订阅 Supabase Realtime (direct_messages / friend_requests)
+PUSH_POLL_SECONDS = 2            # 聊天面板检查本地 Hub 的间隔 (纯内存，不访问数据库)
+PUSH_FALLBACK_SECONDS = 10       # Realtime 不在线时，聊天面板退回按此间隔查询数据库
+BOOTSTRAP_TTL = 10               # 会话首屏数据 (资料 / 节点数 / 节点摘要) 的缓存秒数
 
 # ==========================================
 # 🧠 AI 指令集 (中文强化版)
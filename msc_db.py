@@ -1,22 +1,143 @@
 ### msc_db.py ###
 import streamlit as st
-from supabase import create_client, Client
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from supabase import create_client, Client, ClientOptions
+import httpx
 import hashlib
+import sqlite3
 import json
-from datetime import datetime, timezone
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+import msc_config as config
+import msc_vec as vec_codec
+import msc_cache
+import msc_log
+import msc_pool
+import msc_store
+import msc_hub
+import msc_presence
+import msc_radar as radar_codec
+import msc_node as node_model
+from msc_cache import cached
 
 # ==========================================
 # 🛡️ 安全配置 & 初始化
 # ==========================================
+def _secret(key, default=None):
+    try: return st.secrets.get(key, default)
+    except: return default  # 没有 secrets.toml (本地 sqlite 模式)
+
+try:
+    STORAGE_BACKEND = _secret("STORAGE_BACKEND", config.STORAGE_BACKEND)
+    SALT = _secret("PASSWORD_SALT", "msc_default_salt")
+    if STORAGE_BACKEND == "supabase":
+        SUPABASE_URL = st.secrets["SUPABASE_URL"]
+        SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
+except Exception as e:
+    st.error(f"Database Connection Failed: {e}")
+    st.stop()
+
+# ==========================================
+# 🔗 客户端池：keep-alive、单次调用超时、幂等调用带抖动重试
+# ==========================================
+def _make_client() -> Client:
+    http = httpx.Client(
+        timeout=httpx.Timeout(config.DB_CALL_TIMEOUT, connect=config.DB_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=config.DB_CONNECTIONS_PER_CLIENT, max_keepalive_connections=config.DB_CONNECTIONS_PER_CLIENT, keepalive_expiry=60)
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(httpx_client=http, postgrest_client_timeout=config.DB_CALL_TIMEOUT))
+
+def _make_sqlite_client():
+    return msc_store.SQLiteClient(_secret("STORE_SQLITE_PATH", config.STORE_SQLITE_PATH))
+
+# 🟢 存储后端可插拔：两种客户端提供同一套 table().select().eq()...execute() 接口
+if STORAGE_BACKEND == "sqlite":
+    _pool = msc_pool.ClientPool(
+        _make_sqlite_client, size=config.DB_POOL_SIZE, retries=config.DB_READ_RETRIES,
+        deadline=config.DB_DEADLINE, retry_on=(sqlite3.OperationalError,)  # database is locked
+    )
+else:
+    _pool = msc_pool.ClientPool(
+        _make_client, size=config.DB_POOL_SIZE, retries=config.DB_READ_RETRIES,
+        deadline=config.DB_DEADLINE, retry_on=(httpx.TransportError,)
+    )
+
 try:
-    SUPABASE_URL = st.secrets["SUPABASE_URL"]
-    SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-    SALT = st.secrets.get("PASSWORD_SALT", "msc_default_salt") 
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    with _pool.client(): pass  # 预热一个客户端，配置错误时立即暴露
 except Exception as e:
     st.error(f"Database Connection Failed: {e}")
     st.stop()
 
+def _read(build):
+    """读：幂等，传输层失败时重试"""
+    return _pool.execute(build, idempotent=True)
+
+_fanout = ThreadPoolExecutor(max_workers=config.DB_POOL_SIZE, thread_name_prefix="msc-db")
+
+def _read_many(*builds):
+    """多个独立读取并发执行 (各占一个池内客户端)，总耗时约等于最慢的一次往返"""
+    return [f.result() for f in [_fanout.submit(_read, b) for b in builds]]
+
+def _write(build, idempotent=False):
+    """写：insert 默认不重试；按条件的 update / delete / upsert 可标记为幂等"""
+    return _pool.execute(build, idempotent=idempotent)
+
+def get_db_pool_stats():
+    return dict(_pool.stats(), backend=STORAGE_BACKEND)
+
+# 🟢 推送：每个进程一条 Realtime 订阅，变更经本地 Hub 分发给相关会话 (sqlite 模式只用本地 Hub)
+_realtime = None
+if STORAGE_BACKEND == "supabase" and _secret("PUSH_REALTIME", config.PUSH_REALTIME):
+    try: _realtime = msc_hub.RealtimeBridge(SUPABASE_URL, SUPABASE_KEY).start()
+    except Exception as e: print(f"Realtime Init Error: {e}")
+
+def get_push_cursor():
+    return msc_hub.hub.cursor()
+
+def poll_push(username, since=0):
+    return msc_hub.hub.poll(msc_hub.user_topic(username), since)
+
+def is_push_live():
+    """sqlite 模式下写入都在本进程，Hub 即完整事件源；supabase 模式需要 Realtime 在线"""
+    return STORAGE_BACKEND == "sqlite" or bool(_realtime and _realtime.stats["connected"])
+
+def get_push_stats():
+    return dict(msc_hub.hub.stats, realtime=_realtime.stats if _realtime else None)
+
+# 🟢 共享缓存层 (多 worker 部署)：失败时退回进程内缓存
+msc_cache.set_local_limit(config.CACHE_L1_MAX_ENTRIES)
+try:
+    msc_cache.configure(msc_cache.make_backend(
+        _secret("CACHE_BACKEND", config.CACHE_BACKEND),
+        url=_secret("REDIS_URL"),
+        path=config.CACHE_SQLITE_PATH,
+        max_entries=config.CACHE_MAX_ENTRIES
+    ))
+except Exception as e:
+    print(f"Cache Backend Init Error: {e}")
+
+# 🟢 请求级记忆：以本次脚本运行的 ctx.cursors 对象标识一次 rerun (每次运行开始时 Streamlit 会重建它)
+def _script_run_token():
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.cursors if ctx is not None else None
+
+msc_cache.set_request_scope(_script_run_token)
+
+def get_request_stats():
+    return {"this_run": msc_cache.current_request_stats(), "total": dict(msc_cache.request_stats)}
+
+def _fetch_all(build_query, page_size=1000):
+    """分页拉取全部行 (PostgREST 单次最多返回 max-rows 行)"""
+    rows, start = [], 0
+    while True:
+        batch = _read(lambda db: build_query(db).range(start, start + page_size - 1)).data
+        rows.extend(batch)
+        if len(batch) < page_size: return rows
+        start += page_size
+
 def make_hashes(password):
     raw = f"{SALT}{password}{SALT}"
     return hashlib.sha256(str.encode(raw)).hexdigest()
@@ -24,7 +145,17 @@ def make_hashes(password):
 # ==========================================
 # 📊 可观测性：系统日志 (Fixed)
 # ==========================================
-def log_system_event(level, component, message, user="system"):
+def _write_log_rows(rows):
+    _write(lambda db: db.table('system_logs').insert(rows, returning="minimal"))
+
+_log_pipeline = msc_log.LogPipeline(
+    _write_log_rows,
+    max_queue=config.LOG_QUEUE_SIZE, batch_size=config.LOG_BATCH_SIZE,
+    flush_interval=config.LOG_FLUSH_INTERVAL, sample_rates=config.LOG_SAMPLE_RATES
+)
+
+def log_system_event(level, component, message, user="system", sync=False):
+    """默认异步入队；sync=True 用于之后会被查询的事件记录 (不采样，立即写入)"""
     try:
         payload = {
             "level": level, "component": component,
@@ -32,15 +163,19 @@ def log_system_event(level, component, message, user="system"):
             "created_at": datetime.now(timezone.utc).isoformat(), 
             "user_id": user # 确保这里字段名对应数据库列名
         }
-        supabase.table('system_logs').insert(payload).execute()
+        if sync: _write_log_rows([payload])
+        else: _log_pipeline.submit(payload)
     except Exception as e: 
         print(f"Log Error: {e}") # 打印错误以便调试
 
+def get_log_pipeline_stats():
+    return dict(_log_pipeline.stats)
+
 # 🟢 检查用户是否发生过某类事件 (Fixed)
 def check_user_event_exists(username, component_tag):
     try:
         # 查询 component = 'ASCENSION_EVENT' 且 user_id = username 的记录
-        res = supabase.table('system_logs').select("id").eq('user_id', username).eq('component', component_tag).limit(1).execute()
+        res = _read(lambda db: db.table('system_logs').select("id").eq('user_id', username).eq('component', component_tag).limit(1))
         return len(res.data) > 0
     except: return False
 
@@ -50,16 +185,16 @@ def check_user_event_exists(username, component_tag):
 def login_user(username, password):
     try:
         hashed_new = make_hashes(password)
-        res = supabase.table('users').select("*").eq('username', username).eq('password', hashed_new).execute()
+        res = _read(lambda db: db.table('users').select("*").eq('username', username).eq('password', hashed_new))
         if res.data:
             log_system_event("INFO", "Auth", f"User {username} logged in (Secure)", username)
             return res.data
         
         hashed_old = hashlib.sha256(str.encode(password)).hexdigest()
-        res_old = supabase.table('users').select("*").eq('username', username).eq('password', hashed_old).execute()
+        res_old = _read(lambda db: db.table('users').select("*").eq('username', username).eq('password', hashed_old))
         
         if res_old.data:
-            supabase.table('users').update({"password": hashed_new}).eq("username", username).execute()
+            _write(lambda db: db.table('users').update({"password": hashed_new}).eq("username", username), idempotent=True)
             log_system_event("WARN", "Auth", f"User {username} migrated to secure password", username)
             return res_old.data
         return []
@@ -69,16 +204,17 @@ def login_user(username, password):
 
 def add_user(username, password, nickname, country="Other"):
     try:
-        res = supabase.table('users').select("*").eq('username', username).execute()
+        res = _read(lambda db: db.table('users').select("*").eq('username', username))
         if len(res.data) > 0: return False 
         
-        radar = {"Care":3.0,"Curiosity":3.0,"Reflection":3.0,"Coherence":3.0,"Empathy":3.0,"Agency":3.0,"Aesthetic":3.0}
         data = {
             "username": username, "password": make_hashes(password),
-            "nickname": nickname, "radar_profile": json.dumps(radar),
+            "nickname": nickname, "radar_profile": radar_codec.encode(radar_codec.default()),
             "country": country, "last_seen": datetime.now(timezone.utc).isoformat()
         }
-        supabase.table('users').insert(data).execute()
+        _write(lambda db: db.table('users').insert(data))
+        count_users.clear()
+        get_all_users.clear()
         return True
     except: return False
 
@@ -86,132 +222,533 @@ def add_user(username, password, nickname, country="Other"):
 # 📖 读取操作
 # ==========================================
 
-@st.cache_data(ttl=300)
+@cached(ttl=300)
 def get_nickname(username):
     try:
-        res = supabase.table('users').select("nickname").eq('username', username).execute()
+        res = _read(lambda db: db.table('users').select("nickname").eq('username', username))
         if res.data: return res.data[0]['nickname']
         return username
     except: return username
 
-@st.cache_data(ttl=60)
+def _user_profile_query(db, username):
+    return db.table('users').select("*").eq('username', username)
+
+@cached(ttl=60)
 def get_user_profile(username):
     try:
-        res = supabase.table('users').select("*").eq('username', username).execute()
+        res = _read(lambda db: _user_profile_query(db, username))
         if res.data: return res.data[0]
     except: pass
     return {"nickname": username, "radar_profile": None}
 
+def _after_radar_saved(username, radar_profile):
+    get_user_profile.clear(username)
+    get_session_bootstrap.clear(username)
+    get_all_users.update(lambda users, _: [dict(u, radar_profile=radar_profile) if u['username'] == username else u for u in users])
+
 def update_radar_score(username, input_scores):
-    try:
-        supabase.table('users').update({"radar_profile": input_scores}).eq("username", username).execute()
-        get_user_profile.clear()
-    except: pass
+    """input_scores 为本次分析得到的各轴分数 (增量)，融合在服务端 / 乐观锁下完成"""
+    return apply_radar_deltas([(username, input_scores)]).get(username)
+
+def _write_heartbeats(usernames, ts):
+    """一批活跃用户共用同一个时间戳，一次 update ... in (...) 写完"""
+    last_seen = datetime.fromtimestamp(ts, timezone.utc).isoformat()
+    _write(lambda db: db.table('users').update({"last_seen": last_seen}, returning="minimal").in_('username', usernames), idempotent=True)
+
+_presence = msc_presence.PresenceTracker(_write_heartbeats, flush_interval=config.HEARTBEAT_FLUSH_SECONDS)
 
 def update_heartbeat(username):
-    try: supabase.table('users').update({"last_seen": datetime.now(timezone.utc).isoformat()}).eq("username", username).execute()
-    except: pass
+    """只记在内存里，由后台线程按 HEARTBEAT_FLUSH_SECONDS 合并写入"""
+    _presence.touch(username)
+
+def get_local_last_seen(username):
+    return _presence.last_seen(username)
+
+def get_presence_stats():
+    return dict(_presence.stats)
 
 # ==========================================
 # 💾 数据写入
 # ==========================================
+def _after_chats_saved(username, rows):
+    # 新消息直接追加到缓存尾部，不触发重新查询
+    if rows: _chat_tail.update(lambda tail, _: (tail + list(rows))[-config.CHAT_PAGE_SIZE:], username)
+    else: _chat_tail.clear(username)
+
 def save_chat(username, role, content):
     try: 
-        supabase.table('chats').insert({"username": username, "role": role, "content": content, "is_deleted": False}).execute()
-        get_active_chats.clear()
-        get_active_chats.clear()
+        res = _write(lambda db: db.table('chats').insert({"username": username, "role": role, "content": content, "is_deleted": False}))
+        _after_chats_saved(username, res.data)
     except: pass
 
-@st.cache_data(ttl=10)
+def _read_chat_page(username, before_id=None, after_id=None, limit=None):
+    limit = limit or config.CHAT_PAGE_SIZE
+    def build(db):
+        q = db.table('chats').select("*").eq('username', username).eq('is_deleted', False)
+        if after_id is not None: return q.gt('id', after_id).order('id').limit(limit)
+        if before_id is not None: q = q.lt('id', before_id)
+        return q.order('id', desc=True).limit(limit)
+    rows = _read(build).data
+    return rows if after_id is not None else list(reversed(rows))
+
+def get_chat_page(username, before_id=None, after_id=None, limit=None):
+    """按 id 做 keyset 分页，返回按 id 升序：默认最新一页 / before_id 更旧一页 / after_id 之后的新消息"""
+    try: return _read_chat_page(username, before_id, after_id, limit)
+    except: return []
+
+@cached(ttl=300)
+def _chat_tail(username):
+    """最新一页 (缓存尾部)：写入时原地追加，所以 TTL 可以长；读取失败直接抛出，不把空结果缓存下来"""
+    return _read_chat_page(username)
+
 def get_active_chats(username):
-    try:
-        res = supabase.table('chats').select("*").eq('username', username).eq('is_deleted', False).order('id', desc=True).limit(50).execute()
-        return list(reversed(res.data))
+    try: return _chat_tail(username)
     except: return []
 
+def _node_payload(username, content, data, mode, vector):
+    loc_data = data.get('location', {}) if data.get('location') else {}
+    return {
+        "username": username, "content": content, "care_point": data.get('care_point','?'), 
+        "meaning_layer": data.get('meaning_layer',''), "insight": data.get('insight', ''), 
+        "mode": mode, "vector": vec_codec.encode_vector(vector), "logic_score": data.get('m_score', 0.5), 
+        "keywords": json.dumps(data.get('keywords', [])), "is_deleted": False, "location": loc_data
+    }
+
+def _after_node_saved(username, row):
+    if row: _cache_new_node(row)
+    else: _evict_user_nodes(username)
+    _bump_node_count(username)
+    logic = (row or {}).get('logic_score') or 0.5
+    log_system_event("INFO", "Node", f"Node created by {username} ({float(logic):.2f})", username)
+
 def save_node(username, content, data, mode, vector):
     try:
-        logic = data.get('m_score', 0.5)
-        kw = json.dumps(data.get('keywords', []))
-        vec = str(vector) 
-        loc_data = data.get('location', {}) if data.get('location') else {}
-
-        payload = {
-            "username": username, "content": content, "care_point": data.get('care_point','?'), 
-            "meaning_layer": data.get('meaning_layer',''), "insight": data.get('insight', ''), 
-            "mode": mode, "vector": vec, "logic_score": logic, 
-            "keywords": kw, "is_deleted": False, "location": loc_data
-        }
-        
-        supabase.table('nodes').insert(payload).execute()
-        
-        get_active_nodes_map.clear()
-        get_global_nodes.clear()
-        get_all_nodes_for_map.clear()
-        
-        log_system_event("INFO", "Node", f"Node created by {username} ({logic:.2f})", username)
+        payload = _node_payload(username, content, data, mode, vector)
+        res = _write(lambda db: db.table('nodes').insert(payload))
+        _after_node_saved(username, res.data[0] if res.data else None)
         return True, "Success"
     except Exception as e:
         return False, str(e)
 
-@st.cache_data(ttl=60)
-def get_active_nodes_map(username):
+# ==========================================
+# 🧾 一轮对话的合并提交 (Commit Turn)
+# ==========================================
+# 两条 chat + 意义节点 + 雷达，一次 RPC 在同一个事务里写完 (一次往返，不会留下半截数据)
+# Supabase 需先在 SQL Editor 中执行 COMMIT_TURN_INSTALL_SQL (= RADAR_DELTAS_SQL + COMMIT_TURN_SQL)：
+# msc_commit_turn 内部调用 msc_apply_radar_deltas，只装前者时每一轮都会报错 (节点随事务一起回滚)
+# 两个函数都未安装时退回批量写入 + 失败补偿
+COMMIT_TURN_RPC = "msc_commit_turn"
+COMMIT_TURN_SQL = """
+create or replace function msc_commit_turn(p_username text, p_chats jsonb, p_node jsonb default null,
+                                           p_radar_scores jsonb default null, p_alpha float8 default 0.12, p_axes text[] default null)
+returns jsonb language plpgsql as $$
+declare v_chats jsonb; v_node jsonb; v_radar text;
+begin
+  with ins as (
+    insert into chats (username, role, content, is_deleted)
+    select p_username, c->>'role', c->>'content', false from jsonb_array_elements(p_chats) c
+    returning *
+  )
+  select coalesce(jsonb_agg(to_jsonb(ins) order by ins.id), '[]'::jsonb) into v_chats from ins;
+  if p_node is not null then
+    insert into nodes (username, content, care_point, meaning_layer, insight, mode, vector, logic_score, keywords, is_deleted, location)
+    values (p_username, p_node->>'content', p_node->>'care_point', p_node->>'meaning_layer', p_node->>'insight', p_node->>'mode',
+            p_node->>'vector', (p_node->>'logic_score')::float, p_node->>'keywords', false, p_node->'location')
+    returning to_jsonb(nodes.*) into v_node;
+  end if;
+  if p_radar_scores is not null then
+    v_radar := msc_apply_radar_deltas(jsonb_build_array(jsonb_build_object('username', p_username, 'scores', p_radar_scores)), p_alpha, p_axes)->>p_username;
+  end if;
+  return jsonb_build_object('chats', v_chats, 'node', v_node, 'radar_profile', v_radar);
+end $$;
+"""
+_rpc_missing = set()
+
+def _is_missing_rpc(e):
+    text = str(e)
+    return "PGRST202" in text or "Could not find the function" in text or "Unknown rpc" in text
+
+def _call_rpc(name, params, idempotent=False):
+    """调用存储过程；未安装时记下并返回 None，由调用方退回客户端实现 (只读的过程可标记为幂等，失败时重试)"""
+    if name in _rpc_missing: return None
+    try: return _write(lambda db: db.rpc(name, params), idempotent=idempotent).data
+    except Exception as e:
+        if not _is_missing_rpc(e): raise
+        _rpc_missing.add(name)
+        log_system_event("WARN", "RPC", f"RPC {name} not installed, using client-side fallback")
+        return None
+
+def _commit_turn_batched(username, chats, node, radar_scores):
+    """未安装 RPC 时：节点 → chats 批量插入 → 雷达；chats 失败时删除刚写入的节点"""
+    node_row = None
+    if node:
+        res = _write(lambda db: db.table('nodes').insert(node))
+        node_row = res.data[0] if res.data else None
     try:
-        res = supabase.table('nodes').select("*").eq('username', username).eq('is_deleted', False).execute()
-        return {n['content']: n for n in res.data}
-    except: return {}
+        chat_rows = _write(lambda db: db.table('chats').insert([dict(c, username=username, is_deleted=False) for c in chats])).data if chats else []
+    except:
+        if node_row: _write(lambda db: db.table('nodes').delete().eq('id', node_row['id']), idempotent=True)
+        raise
+    radar = None
+    if radar_scores:
+        try: radar = _apply_radar_cas([(username, radar_scores)]).get(username)
+        except Exception as e: log_system_event("ERROR", "Radar", str(e), username)
+    return {"chats": chat_rows, "node": node_row, "radar_profile": radar}
 
-@st.cache_data(ttl=60)
-def get_all_nodes_for_map(username):
+def commit_turn(username, chats, node=None, radar_scores=None):
+    """
+    chats: [{"role", "content"}]；node: (content, data, mode, vector) 或 None
+    radar_scores: 本轮分析的雷达分数 (与当前雷达的 EMA 融合在同一事务里完成) 或 None
+    返回 (ok, msg)
+    """
+    payload = _node_payload(username, *node) if node else None
+    deltas = _normalize_deltas([(username, radar_scores)])  # LLM 输出：非数值分数丢弃，不能让整个事务失败
+    radar_scores = deltas[0]['scores'] if deltas else None
     try:
-        res = supabase.table('nodes').select("*").eq('username', username).eq('is_deleted', False).execute()
-        return res.data
+        params = {"p_username": username, "p_chats": chats, "p_node": payload, "p_radar_scores": radar_scores,
+                  "p_alpha": config.RADAR_ALPHA, "p_axes": config.RADAR_AXES}
+        result = _call_rpc(COMMIT_TURN_RPC, params)
+        if result is None: result = _commit_turn_batched(username, chats, payload, radar_scores)
+    except Exception as e:
+        log_system_event("ERROR", "CommitTurn", str(e), username)
+        return False, str(e)
+
+    if chats: _after_chats_saved(username, result.get('chats'))
+    if payload: _after_node_saved(username, result.get('node'))
+    if result.get('radar_profile') is not None: _after_radar_saved(username, result['radar_profile'])
+    return True, "Success"
+
+# ==========================================
+# 🧭 雷达原子更新 (Radar Deltas)
+# ==========================================
+# 雷达是 EMA：new = old * (1 - α) + score * α + 0.5，上限 10
+# 客户端先读再写会在并发时丢更新，因此融合放在服务端：一批增量一次 RPC，行锁 (for update) 内逐条叠加
+# 未安装 RADAR_DELTAS_SQL 时退回乐观锁：按读到的旧值做条件 update，被别人抢先就重读重算
+# radar_profile 列保存 msc_radar 编码的 JSON 数组文本 (顺序 = p_axes)；旧的 JSON 对象在下次更新时被改写为数组
+RADAR_DELTAS_RPC = "msc_apply_radar_deltas"
+RADAR_DELTAS_SQL = """
+create or replace function msc_apply_radar_deltas(p_updates jsonb, p_alpha float8 default 0.12, p_axes text[] default null)
+returns jsonb language plpgsql as $$
+declare u jsonb; cur jsonb; nxt jsonb; axis text; i int; v float8; result jsonb := '{}'::jsonb;
+begin
+  p_axes := coalesce(p_axes, array['Care','Curiosity','Reflection','Coherence','Agency','Aesthetic','Transcendence']);
+  for u in select * from jsonb_array_elements(p_updates) loop
+    select coalesce(nullif(radar_profile, '')::jsonb, '[]'::jsonb) into cur from users where username = u->>'username' for update;
+    if not found then continue; end if;
+    nxt := '[]'::jsonb; i := 0;
+    foreach axis in array p_axes loop
+      if jsonb_typeof(cur) = 'array' then v := coalesce((cur->>i)::float8, 3.0);
+      else v := coalesce((cur->>axis)::float8, 3.0);
+      end if;
+      if u->'scores' ? axis then
+        v := v * (1 - p_alpha) + (u->'scores'->>axis)::float8 * p_alpha + 0.5;
+      end if;
+      nxt := nxt || to_jsonb(round(least(10.0, v)::numeric, 2));
+      i := i + 1;
+    end loop;
+    update users set radar_profile = nxt::text where username = u->>'username';
+    result := result || jsonb_build_object(u->>'username', nxt::text);
+  end loop;
+  return result;
+end $$;
+"""
+# 一轮对话的合并提交依赖雷达函数：两者一起安装 (先雷达，后提交)
+COMMIT_TURN_INSTALL_SQL = RADAR_DELTAS_SQL + COMMIT_TURN_SQL
+
+def _normalize_deltas(updates):
+    """[(username, scores)] → [{"username", "scores"}]；scores 可为 JSON 字符串，非数值分数与空增量被丢弃"""
+    out = []
+    for username, scores in updates:
+        if isinstance(scores, str):
+            try: scores = json.loads(scores)
+            except: continue
+        if not isinstance(scores, dict): continue
+        clean = {}
+        for k, v in scores.items():
+            if k not in config.RADAR_AXES: continue
+            try: v = float(v)
+            except: continue
+            if math.isfinite(v): clean[k] = v
+        if username and clean: out.append({"username": username, "scores": clean})
+    return out
+
+def _apply_radar_cas(updates):
+    """乐观锁：一次批量读取旧值，每个用户折叠自己的全部增量后做 update ... where radar_profile = 旧值；冲突则重读重试"""
+    pending = {}
+    for u in _normalize_deltas(updates): pending.setdefault(u['username'], []).append(u['scores'])
+    out = {}
+    for attempt in range(config.RADAR_CAS_RETRIES + 1):
+        if not pending: break
+        rows = _read(lambda db: db.table('users').select("username,radar_profile").in_('username', list(pending))).data
+        conflicts = {}
+        for row in rows:
+            name, old = row['username'], row.get('radar_profile')
+            radar = old
+            for scores in pending[name]: radar = radar_codec.blend(radar, scores)
+            radar = radar_codec.encode(radar)
+            def build(db, name=name, old=old, radar=radar):
+                q = db.table('users').update({"radar_profile": radar}).eq('username', name)
+                return q.eq('radar_profile', old) if old is not None else q.is_('radar_profile', 'null')
+            # 不标记幂等：响应丢失后重发会因旧值不匹配而落空，再被当作冲突重算一次
+            if _write(build).data: out[name] = radar
+            else: conflicts[name] = pending[name]
+        pending = conflicts
+    if pending: log_system_event("WARN", "Radar", f"CAS gave up after {config.RADAR_CAS_RETRIES} retries: {sorted(pending)}")
+    return out
+
+def apply_radar_deltas(updates):
+    """
+    updates: [(username, scores)]，按顺序融合；同一用户可出现多次 (依次叠加)
+    一次调用处理整批 (模拟器可一次提交数百条)；返回 {username: 新雷达 JSON}
+    """
+    deltas = _normalize_deltas(updates)
+    if not deltas: return {}
+    try:
+        result = _call_rpc(RADAR_DELTAS_RPC, {"p_updates": deltas, "p_alpha": config.RADAR_ALPHA, "p_axes": config.RADAR_AXES})
+        if result is None: result = _apply_radar_cas(updates)
+    except Exception as e:
+        log_system_event("ERROR", "Radar", str(e))
+        return {}
+    for username, radar in result.items(): _after_radar_saved(username, radar)
+    return result
+
+# 🟢 列投影：默认不读取 vector 列 (约 15KB/行，只有聚类需要)
+NODE_SUMMARY_COLUMNS = "id,username,content,care_point,meaning_layer,insight,mode,logic_score,keywords,location,is_deleted,created_at"
+NODE_FULL_COLUMNS = "*"
+GLOBAL_NODE_LIMIT = 500
+# 节点读取接口返回 msc_node.Node：行在这里解码一次，缓存和所有渲染器共享同一批对象
+
+def _node_columns(with_vectors):
+    return NODE_FULL_COLUMNS if with_vectors else NODE_SUMMARY_COLUMNS
+
+@cached(ttl=60)
+def get_active_nodes_map(username, with_vectors=False):
+    # 与 get_all_nodes_for_map 是同一批行，只换成 content -> node 的索引，不再单独查询
+    return {n.content: n for n in get_all_nodes_for_map(username, with_vectors)}
+
+@cached(ttl=60)
+def get_all_nodes_for_map(username, with_vectors=False):
+    try:
+        res = _read(lambda db: db.table('nodes').select(_node_columns(with_vectors)).eq('username', username).eq('is_deleted', False))
+        return node_model.from_rows(res.data)
     except: return []
 
-@st.cache_data(ttl=120)
-def get_global_nodes():
+@cached(ttl=120)
+def get_global_nodes(with_vectors=False):
     try: 
-        return supabase.table('nodes').select("*").eq('is_deleted', False).order('id', desc=True).limit(500).execute().data
+        return node_model.from_rows(_read(lambda db: db.table('nodes').select(_node_columns(with_vectors)).eq('is_deleted', False).order('id', desc=True).limit(GLOBAL_NODE_LIMIT)).data)
     except: return []
 
+# 🟢 键级缓存维护：只影响写入者自己的条目，全局列表原地追加
+def _evict_user_nodes(username):
+    get_session_bootstrap.clear(username)
+    get_active_nodes_map.clear(username)
+    get_all_nodes_for_map.clear(username)
+    count_nodes.clear(username)
+    count_nodes.clear(None)
+    get_global_nodes.clear()
+
+def _cache_new_node(row):
+    username, mode = row['username'], row.get('mode')
+    full = node_model.Node(row)
+    summary = node_model.Node({k: row.get(k) for k in NODE_SUMMARY_COLUMNS.split(',')})
+    pick = lambda params: full if params['with_vectors'] else summary
+
+    get_session_bootstrap.clear(username)
+    get_active_nodes_map.update(lambda nodes, p: {**nodes, full.content: pick(p)}, username)
+    get_all_nodes_for_map.update(lambda nodes, p: nodes + [pick(p)], username)
+    get_global_nodes.update(lambda nodes, p: ([pick(p)] + nodes)[:GLOBAL_NODE_LIMIT])
+    _append_embedding(row)
+    count_nodes.update(lambda n, p: n + 1 if p['username'] in (None, username) and p['mode'] in (None, mode) else n)
+
+# ==========================================
+# 🚀 会话首屏 (Session Bootstrap)
+# ==========================================
+_bootstrap_executor = ThreadPoolExecutor(max_workers=config.DB_POOL_SIZE, thread_name_prefix="msc-boot")
+
+@cached(ttl=config.BOOTSTRAP_TTL)
+def get_session_bootstrap(username):
+    """侧边栏首屏数据：资料 / 终身节点数 / 节点摘要，各项并发获取，总耗时约等于最慢的一次往返"""
+    profile, node_count, nodes = [f.result() for f in (
+        _fanout.submit(get_user_profile, username),
+        _fanout.submit(count_nodes, username, None, False, True),
+        _fanout.submit(get_all_nodes_for_map, username),
+    )]
+    return {"profile": profile, "node_count": node_count, "nodes": nodes}
+
+def prefetch_session_bootstrap(username):
+    """后台开始获取首屏数据，调用方可同时做别的事 (独立线程池，避免与 _fanout 互相等待)"""
+    return _bootstrap_executor.submit(get_session_bootstrap, username)
+
+# ==========================================
+# 🔢 计数聚合 (只返回数字，不传输行内容)
+# ==========================================
+def _count_query(db, table, estimated=False):
+    return db.table(table).select("id", count="estimated" if estimated else "exact", head=True)
+
+@cached(ttl=30)
+def count_nodes(username=None, mode=None, estimated=False, include_archive=False):
+    """
+    节点计数：按用户 / 按模式 / 全局；estimated=True 使用规划器估算 (大表更快)
+    include_archive=True 时加上冷存储中的节点 (终身计数，用于解锁阈值)
+    """
+    tables = ['nodes', ARCHIVE_TABLE] if include_archive else ['nodes']
+    total = 0
+    for table in tables:
+        def build(db):
+            q = _count_query(db, table, estimated).eq('is_deleted', False)
+            if username: q = q.eq('username', username)
+            if mode: q = q.eq('mode', mode)
+            return q
+        try: total += _read(build).count or 0
+        except: pass
+    return total
+
+@cached(ttl=60)
+def count_users(estimated=False):
+    try: return _read(lambda db: _count_query(db, 'users', estimated).neq('username', 'admin')).count or 0
+    except: return 0
+
+# 🟢 常驻向量库：全量节点向量 (按 EMBEDDING_PRECISION 量化)，每个进程一份
+# 新节点在 _cache_new_node 中追加 (写时复制)；读取失败或为空时不缓存，下次调用重新构建
+_embeddings = {}  # precision -> {"row_of", "index", "built_at"}
+_embeddings_lock = threading.Lock()
+EMBEDDING_INDEX_TTL = 300
+
+def get_global_embeddings(precision=None):
+    precision = precision or config.EMBEDDING_PRECISION
+    with _embeddings_lock:
+        hit = _embeddings.get(precision)
+        if hit is not None and time.time() - hit["built_at"] < EMBEDDING_INDEX_TTL: return hit
+    try:
+        rows = _fetch_all(lambda db: db.table('nodes').select("id,vector").eq('is_deleted', False).order('id'))
+    except: rows = []
+    matrix, keep = vec_codec.decode_matrix([r['vector'] for r in rows])
+    store = {
+        "row_of": {rows[i]['id']: r for r, i in enumerate(keep)},
+        "index": vec_codec.quantize(matrix, precision),
+        "built_at": time.time()
+    }
+    if keep:
+        with _embeddings_lock: _embeddings[precision] = store
+    return store
+
+def _append_embedding(row):
+    vec = vec_codec.decode_vector(row.get('vector'))
+    if vec is None or row.get('id') is None: return
+    with _embeddings_lock:
+        for precision, store in list(_embeddings.items()):
+            data = store["index"]['data']
+            if data.shape[1] != vec.size or row['id'] in store["row_of"]: continue
+            _embeddings[precision] = dict(store, row_of={**store["row_of"], row['id']: data.shape[0]},
+                                          index=vec_codec.append(store["index"], vec[None, :]))
+
+# 🟢 节点计数索引：{username: 节点数 (热表 + 冷表)}，服务端 group by 一次返回，写入时原地维护
+# Supabase 需先在 SQL Editor 中执行 NODE_COUNTS_SQL (返回单个 jsonb 对象，不受 max-rows 限制)
+# 未安装时退回逐页拉取 username 列在客户端计数 (O(节点总数) 次往返，仅作兜底)
+NODE_COUNTS_RPC = "msc_node_counts"
+NODE_COUNTS_SQL = """
+create or replace function msc_node_counts()
+returns jsonb language sql stable as $$
+  select coalesce(jsonb_object_agg(username, n), '{}'::jsonb) from (
+    select username, count(*) as n from (
+      select username from nodes where is_deleted = false
+      union all
+      select username from nodes_archive where is_deleted = false
+    ) t group by username
+  ) c;
+$$;
+"""
+_node_counts = {"data": None, "built_at": 0.0}
+_node_counts_lock = threading.Lock()
+NODE_COUNT_TTL = 300
+
+def _node_counts_paged():
+    rows = _fetch_all(lambda db: db.table('nodes').select("username").eq('is_deleted', False).order('id'))
+    try: rows += _fetch_all(lambda db: db.table(ARCHIVE_TABLE).select("username").eq('is_deleted', False).order('id'))
+    except: pass
+    counts = {}
+    for r in rows: counts[r['username']] = counts.get(r['username'], 0) + 1
+    return counts
+
+def get_node_count_index():
+    with _node_counts_lock:
+        if _node_counts["data"] is not None and time.time() - _node_counts["built_at"] < NODE_COUNT_TTL:
+            return _node_counts["data"]
+    try:
+        counts = _call_rpc(NODE_COUNTS_RPC, {}, idempotent=True)
+        counts = _node_counts_paged() if counts is None else {u: int(n) for u, n in counts.items()}
+    except: return _node_counts["data"] or {}
+    with _node_counts_lock:
+        _node_counts["data"] = counts
+        _node_counts["built_at"] = time.time()
+    return counts
+
+def _bump_node_count(username, delta=1):
+    with _node_counts_lock:
+        if _node_counts["data"] is not None:
+            _node_counts["data"][username] = max(0, _node_counts["data"].get(username, 0) + delta)
+
+def _drop_node_count(username):
+    with _node_counts_lock:
+        if _node_counts["data"] is not None: _node_counts["data"].pop(username, None)
+
+def _reset_node_count_index():
+    with _node_counts_lock: _node_counts["built_at"] = 0.0  # 下次读取时重建；重建失败仍可返回旧值
+
 # ==========================================
 # 📡 社交 & 消息 & 好友请求
 # ==========================================
-@st.cache_data(ttl=60)
+@cached(ttl=60)
 def get_all_users(curr):
     try: 
-        return supabase.table('users').select("username,nickname,last_seen,uid,radar_profile").neq('username',curr).execute().data
+        return _read(lambda db: db.table('users').select("username,nickname,last_seen,uid,radar_profile").neq('username',curr)).data
     except: return []
 
-def get_direct_messages(u1, u2):
+def _pair_filter(u1, u2):
+    return f"and(sender.eq.{u1},receiver.eq.{u2}),and(sender.eq.{u2},receiver.eq.{u1})"
+
+def get_direct_messages(u1, u2, before_id=None, after_id=None, limit=None):
+    """
+    单次查询双向会话，按 id 做 keyset 分页，返回按 id 升序：
+      默认           最新 limit 条
+      before_id=x    比 x 更旧的 limit 条 (向上翻页)
+      after_id=x     比 x 更新的消息 (自动刷新轮询，通常为空)
+    """
+    limit = limit or config.DM_PAGE_SIZE
+    def build(db):
+        q = db.table('direct_messages').select("*").or_(_pair_filter(u1, u2))
+        if after_id is not None: return q.gt('id', after_id).order('id').limit(limit)
+        if before_id is not None: q = q.lt('id', before_id)
+        return q.order('id', desc=True).limit(limit)
     try:
-        r1 = supabase.table('direct_messages').select("*").eq('sender',u1).eq('receiver',u2).execute()
-        r2 = supabase.table('direct_messages').select("*").eq('sender',u2).eq('receiver',u1).execute()
-        msgs = r1.data + r2.data
-        msgs.sort(key=lambda x: x['id'])
-        return msgs
+        rows = _read(build).data
+        return rows if after_id is not None else list(reversed(rows))
     except: return []
 
 def send_direct_message(s, r, c):
-    try: supabase.table('direct_messages').insert({"sender":s,"receiver":r,"content":c}).execute(); return True
+    try:
+        res = _write(lambda db: db.table('direct_messages').insert({"sender":s,"receiver":r,"content":c}))
+        msc_hub.publish_row('direct_messages', res.data[0] if res.data else {"sender": s, "receiver": r})
+        return True
     except: return False
 
 def get_unread_counts(curr):
     try:
-        res = supabase.table('direct_messages').select("sender").eq('receiver', curr).eq('is_read', False).execute()
+        res = _read(lambda db: db.table('direct_messages').select("sender").eq('receiver', curr).eq('is_read', False))
         counts = {}
         for r in res.data: counts[r['sender']] = counts.get(r['sender'], 0) + 1
         return len(res.data), counts
     except: return 0, {}
 
 def mark_read(s, r):
-    try: supabase.table('direct_messages').update({"is_read":True}).eq('sender',s).eq('receiver',r).execute()
+    try: _write(lambda db: db.table('direct_messages').update({"is_read":True}).eq('sender',s).eq('receiver',r), idempotent=True)
     except: pass
 
 def send_friend_request(sender, receiver, match_type, metaphor):
     try:
         # 检查是否已存在
-        existing = supabase.table('friend_requests').select("*").or_(f"and(sender.eq.{sender},receiver.eq.{receiver}),and(sender.eq.{receiver},receiver.eq.{sender})").execute()
+        existing = _read(lambda db: db.table('friend_requests').select("*").or_(f"and(sender.eq.{sender},receiver.eq.{receiver}),and(sender.eq.{receiver},receiver.eq.{sender})"))
         if existing.data: return False, "Link already exists or pending."
         
         payload = {
@@ -220,26 +757,54 @@ def send_friend_request(sender, receiver, match_type, metaphor):
             "metaphor": metaphor,
             "created_at": datetime.now(timezone.utc).isoformat()
         }
-        supabase.table('friend_requests').insert(payload).execute()
+        res = _write(lambda db: db.table('friend_requests').insert(payload))
+        msc_hub.publish_row('friend_requests', res.data[0] if res.data else payload)
         return True, "Signal Sent"
     except Exception as e: return False, str(e)
 
 def get_pending_requests(receiver):
     try:
-        res = supabase.table('friend_requests').select("*").eq('receiver', receiver).eq('status', 'pending').execute()
+        res = _read(lambda db: db.table('friend_requests').select("*").eq('receiver', receiver).eq('status', 'pending'))
         return res.data
     except: return []
 
 def handle_friend_request(req_id, action): # action: 'accepted' or 'rejected'
     try:
-        supabase.table('friend_requests').update({"status": action}).eq('id', req_id).execute()
+        res = _write(lambda db: db.table('friend_requests').update({"status": action}).eq('id', req_id), idempotent=True)
+        for row in res.data or []: msc_hub.publish_row('friend_requests', row)
         return True
     except: return False
 
+def get_inbox(username, dm_since=0, fr_since=0, watch_ids=()):
+    """
+    收件箱增量 (一次并发往返)：
+      unread   : dm_since 之后新到的未读私信，按发送者计数
+      requests : fr_since 之后新建的好友请求 + watch_ids (我发出、仍在等待的请求) 的当前状态
+    """
+    fr_filter = f"and(sender.eq.{username},id.gt.{fr_since}),and(receiver.eq.{username},id.gt.{fr_since})"
+    if watch_ids: fr_filter += f",id.in.({','.join(str(i) for i in watch_ids)})"
+    try:
+        dms, reqs = _read_many(
+            lambda db: db.table('direct_messages').select("id,sender").eq('receiver', username).eq('is_read', False).gt('id', dm_since).order('id'),
+            lambda db: db.table('friend_requests').select("*").or_(fr_filter).order('id')
+        )
+    except Exception as e:
+        log_system_event("ERROR", "Inbox", str(e), username)
+        return {"unread": {}, "requests": [], "dm_cursor": dm_since, "fr_cursor": fr_since}
+    unread = {}
+    for r in dms.data: unread[r['sender']] = unread.get(r['sender'], 0) + 1
+    return {
+        "unread": unread, "requests": reqs.data,
+        "dm_cursor": max([dm_since] + [r['id'] for r in dms.data]),
+        "fr_cursor": max([fr_since] + [r['id'] for r in reqs.data])
+    }
+
 def get_my_friends(username):
     try:
-        r1 = supabase.table('friend_requests').select("receiver, metaphor").eq('sender', username).eq('status', 'accepted').execute()
-        r2 = supabase.table('friend_requests').select("sender, metaphor").eq('receiver', username).eq('status', 'accepted').execute()
+        r1, r2 = _read_many(
+            lambda db: db.table('friend_requests').select("receiver, metaphor").eq('sender', username).eq('status', 'accepted'),
+            lambda db: db.table('friend_requests').select("sender, metaphor").eq('receiver', username).eq('status', 'accepted')
+        )
         friends = []
         for r in r1.data: friends.append({'username': r['receiver'], 'metaphor': r['metaphor']})
         for r in r2.data: friends.append({'username': r['sender'], 'metaphor': r['metaphor']})
@@ -249,44 +814,119 @@ def get_my_friends(username):
 # ==========================================
 # 🛠️ 系统维护
 # ==========================================
-def process_time_decay():
+def process_time_decay(batch_size=None):
+    """
+    集合式沉积：把超过 TTL_ACTIVE 小时的非 Sediment 节点一次性标记为 Sediment
+    batch_size: None = 单条 UPDATE；否则按 id 区间分批 (超大表)
+    返回: {"sedimented": 行数, "batches": 语句数, "elapsed_ms": 耗时}
+    """
+    started = time.perf_counter()
+    stats = {"sedimented": 0, "batches": 0, "elapsed_ms": 0.0}
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=config.TTL_ACTIVE)).isoformat()
+
+    def sediment(id_from=None, id_to=None):
+        def build(db):
+            q = db.table('nodes').update({"mode": "Sediment"}, count="exact", returning="minimal").neq('mode', 'Sediment').lt('created_at', cutoff)
+            if id_from is not None: q = q.gte('id', id_from).lt('id', id_to)
+            return q
+        stats["sedimented"] += _write(build, idempotent=True).count or 0
+        stats["batches"] += 1
+
     try:
-        res = supabase.table('nodes').select("*").neq('mode', 'Sediment').execute()
-        active_nodes = res.data
-        sediment_count = 0
-        now = datetime.now(timezone.utc)
-        for node in active_nodes:
-            try:
-                created_at = datetime.fromisoformat(node['created_at'].replace('Z', '+00:00'))
-                if (now - created_at).total_seconds() / 3600 > 24:
-                    supabase.table('nodes').update({"mode": "Sediment"}).eq("id", node['id']).execute()
-                    sediment_count += 1
-            except: continue
-        return sediment_count
-    except: return 0
+        if not batch_size:
+            sediment()
+        else:
+            def edge(desc):
+                rows = _read(lambda db: db.table('nodes').select("id").neq('mode', 'Sediment').lt('created_at', cutoff).order('id', desc=desc).limit(1)).data
+                return rows[0]['id'] if rows else None
+            lo, hi = edge(False), edge(True)
+            if lo is not None:
+                for start in range(lo, hi + 1, batch_size): sediment(start, start + batch_size)
+    except Exception as e:
+        log_system_event("ERROR", "Decay", str(e))
+
+    if stats["sedimented"]:
+        count_nodes.clear()  # 按模式的计数变了
+        get_active_nodes_map.clear()
+        get_global_nodes.clear()
+        get_all_nodes_for_map.clear()
+        get_session_bootstrap.clear()
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return stats
+
+# ==========================================
+# 🧊 冷存储：超过 TTL_SEDIMENT 的沉积节点
+# ==========================================
+# 建表: create table nodes_archive (like nodes including all);
+ARCHIVE_TABLE = 'nodes_archive'
+
+def archive_sediment_nodes(batch_size=500):
+    """
+    把超过 TTL_SEDIMENT 小时的 Sediment 节点迁入冷表 (先 upsert 冷表，再删热表，可安全重跑)
+    返回: {"archived": 行数, "batches": 批次, "elapsed_ms": 耗时}
+    """
+    started = time.perf_counter()
+    stats = {"archived": 0, "batches": 0, "elapsed_ms": 0.0}
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=config.TTL_SEDIMENT)).isoformat()
+    try:
+        while True:
+            rows = _read(lambda db: db.table('nodes').select("*").eq('mode', 'Sediment').lt('created_at', cutoff).order('id').limit(batch_size)).data
+            if not rows: break
+            _write(lambda db: db.table(ARCHIVE_TABLE).upsert(rows, returning="minimal"), idempotent=True)
+            _write(lambda db: db.table('nodes').delete(returning="minimal").in_('id', [r['id'] for r in rows]), idempotent=True)
+            stats["archived"] += len(rows)
+            stats["batches"] += 1
+            if len(rows) < batch_size: break
+    except Exception as e:
+        log_system_event("ERROR", "Archive", str(e))
+
+    if stats["archived"]:
+        count_nodes.clear()  # 热表计数变了 (include_archive 的总数不变)
+        _reset_node_count_index()
+        get_active_nodes_map.clear()
+        get_global_nodes.clear()
+        get_all_nodes_for_map.clear()
+        get_session_bootstrap.clear()
+        get_archived_nodes.clear()
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return stats
+
+@cached(ttl=300)
+def get_archived_nodes(username):
+    """只在打开意义盒子历史时按需读取冷存储"""
+    try:
+        return node_model.from_rows(_fetch_all(lambda db: db.table(ARCHIVE_TABLE).select(NODE_SUMMARY_COLUMNS).eq('username', username).eq('is_deleted', False).order('id', desc=True)))
+    except: return []
 
 def get_system_logs(limit=50):
+    _log_pipeline.flush()
     try:
-        return supabase.table('system_logs').select("*").order('created_at', desc=True).limit(limit).execute().data
+        return _read(lambda db: db.table('system_logs').select("*").order('created_at', desc=True).limit(limit)).data
     except: return []
 
 def nuke_user(target_username):
     try:
-        try: supabase.table('system_logs').delete().eq('user_id', target_username).execute()
+        try: _write(lambda db: db.table('system_logs').delete().eq('user_id', target_username), idempotent=True)
         except: pass 
-        supabase.table('direct_messages').delete().eq('sender', target_username).execute()
-        supabase.table('direct_messages').delete().eq('receiver', target_username).execute()
-        supabase.table('nodes').delete().eq('username', target_username).execute()
-        supabase.table('chats').delete().eq('username', target_username).execute()
-        supabase.table('friend_requests').delete().eq('sender', target_username).execute() 
-        supabase.table('friend_requests').delete().eq('receiver', target_username).execute() 
-        supabase.table('users').delete().eq('username', target_username).execute()
+        _write(lambda db: db.table('direct_messages').delete().eq('sender', target_username), idempotent=True)
+        _write(lambda db: db.table('direct_messages').delete().eq('receiver', target_username), idempotent=True)
+        _write(lambda db: db.table('nodes').delete().eq('username', target_username), idempotent=True)
+        try: _write(lambda db: db.table(ARCHIVE_TABLE).delete().eq('username', target_username), idempotent=True)
+        except: pass
+        _write(lambda db: db.table('chats').delete().eq('username', target_username), idempotent=True)
+        _write(lambda db: db.table('friend_requests').delete().eq('sender', target_username), idempotent=True) 
+        _write(lambda db: db.table('friend_requests').delete().eq('receiver', target_username), idempotent=True) 
+        _write(lambda db: db.table('users').delete().eq('username', target_username), idempotent=True)
         
-        get_active_nodes_map.clear()
-        get_global_nodes.clear()
-        get_all_users.clear()
-        get_user_profile.clear()
-        get_active_chats.clear()
+        _evict_user_nodes(target_username)
+        get_archived_nodes.clear(target_username)
+        get_user_profile.clear(target_username)
+        get_nickname.clear(target_username)
+        _chat_tail.clear(target_username)
+        get_all_users.clear(target_username)
+        get_all_users.update(lambda users, _: [u for u in users if u['username'] != target_username])
+        count_users.clear()
+        _drop_node_count(target_username)
         
         return True, "Target eliminated."
     except Exception as e:
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import httpx
+from supabase import create_async_client, AsyncClientOptions
+import msc_config as config
+import msc_db as db
+
+# ==========================================
+# ⚡ 异步数据层 (Async Data Layer)
+# ==========================================
+# 互相独立的读取并发执行：页面耗时约等于最慢的一次查询，而不是所有查询之和
+# 每个进程一个后台事件循环 + 一个 AsyncClient (httpx 连接池多路复用)
+# Streamlit 脚本线程里用 run(coro) / gather(...) 调用；sqlite 后端退回线程池上的同步查询
+#
+#   p1, p2 = adb.gather(adb.get_user_profile(u1), adb.get_user_profile(u2))
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_client_lock = None
+
+def _ensure_loop():
+    global _loop
+    if _loop is not None: return _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="msc-async-db", daemon=True).start()
+            _loop = loop
+    return _loop
+
+def run(coro, timeout=None):
+    """在后台事件循环上执行协程并等待结果 (供脚本线程调用)"""
+    future = asyncio.run_coroutine_threadsafe(coro, _ensure_loop())
+    return future.result(timeout or config.DB_DEADLINE)
+
+def gather(*coros, timeout=None):
+    async def _all(): return await asyncio.gather(*coros)
+    return run(_all(), timeout)
+
+async def _get_client():
+    global _client, _client_lock
+    if _client is not None: return _client
+    if _client_lock is None: _client_lock = asyncio.Lock()
+    async with _client_lock:
+        if _client is None:
+            http = httpx.AsyncClient(
+                timeout=httpx.Timeout(config.DB_CALL_TIMEOUT, connect=config.DB_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=config.DB_POOL_SIZE * config.DB_CONNECTIONS_PER_CLIENT, keepalive_expiry=60)
+            )
+            _client = await create_async_client(db.SUPABASE_URL, db.SUPABASE_KEY, options=AsyncClientOptions(
+                httpx_client=http, postgrest_client_timeout=config.DB_CALL_TIMEOUT
+            ))
+    return _client
+
+async def aread(build):
+    """build(client) 返回查询；与 msc_db._read 相同的语义，重试与统计走 msc_db 的客户端池 (ClientPool.aexecute)"""
+    if db.STORAGE_BACKEND != "supabase":
+        return await asyncio.to_thread(db._read, build)
+    client = await _get_client()
+    return await db._pool.aexecute(lambda: build(client).execute(), idempotent=True)
+
+# ==========================================
+# 📖 异步读取 API (与 msc_db 同名同返回值)
+# ==========================================
+# 先查 msc_db 的缓存，未命中才走网络；查询构造复用 msc_db，结果写回同一个缓存
+async def get_user_profile(username):
+    found, profile = db.get_user_profile.peek(username)
+    if found: return profile
+    try:
+        res = await aread(lambda c: db._user_profile_query(c, username))
+        if res.data:
+            db.get_user_profile.put(res.data[0], username)
+            return res.data[0]
+    except: pass
+    return {"nickname": username, "radar_profile": None}
@@ -0,0 +1,127 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+# ==========================================
+# 📡 本地广播中心 (Broadcast Hub)
+# ==========================================
+# 进程内 pub/sub：按主题 (如 "user:alice") 保存最近的事件，每个事件带全局递增序号
+# 会话只在内存里比较序号，没有新事件时不产生任何数据库请求
+# 事件来源：本进程的写操作直接 publish；其它进程 / 其它实例的写入由 RealtimeBridge 转发
+
+HISTORY_PER_TOPIC = 256
+
+class Hub:
+    def __init__(self, history=HISTORY_PER_TOPIC):
+        self._history = history
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._topics = {}  # topic -> deque[(seq, event)]
+        self._floors = {}  # topic -> 已被挤出历史的最大序号
+        self.stats = {"published": 0, "topics": 0}
+
+    def publish(self, topic, event):
+        with self._cond:
+            self._seq += 1
+            events = self._topics.get(topic)
+            if events is None:
+                events = self._topics[topic] = deque()
+                self.stats["topics"] = len(self._topics)
+            events.append((self._seq, dict(event, seq=self._seq)))
+            while len(events) > self._history:
+                self._floors[topic] = events.popleft()[0]
+            self.stats["published"] += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def cursor(self):
+        return self._seq
+
+    def poll(self, topic, since=0):
+        """
+        返回 (cursor, events)：since 之后发到 topic 的事件 (每个事件带 seq)
+        events 为 None 表示中间有事件已被挤出历史，调用方应整体刷新
+        """
+        with self._cond:
+            if since < self._floors.get(topic, 0): return self._seq, None
+            return self._seq, [e for seq, e in self._topics.get(topic, ()) if seq > since]
+
+    def wait(self, topic, since=0, timeout=None):
+        """阻塞直到 topic 有 since 之后的新事件或超时 (后台消费者 / 测试用)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                cursor, events = self.poll(topic, since)
+                if events is None or events: return cursor, events
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0: return cursor, []
+                self._cond.wait(remaining)
+
+hub = Hub()
+
+def user_topic(username):
+    return f"user:{username}"
+
+def publish_row(table, row, source="local"):
+    """把 direct_messages / friend_requests 的一行变更投递给相关用户的主题"""
+    if not row: return
+    event = {
+        "kind": "dm" if table == "direct_messages" else "friend_request",
+        "id": row.get('id'), "sender": row.get('sender'), "receiver": row.get('receiver'),
+        "status": row.get('status'), "source": source
+    }
+    for user in {row.get('sender'), row.get('receiver')}:
+        if user: hub.publish(user_topic(user), event)
+
+# ==========================================
+# 🔌 Supabase Realtime 桥接
+# ==========================================
+# 每个进程一条 websocket 订阅 (而不是每个会话一条)，收到变更后按 sender / receiver 分发到 Hub
+# 前提：在 Supabase 中把 direct_messages、friend_requests 加入 supabase_realtime publication
+
+class RealtimeBridge:
+    def __init__(self, url, key, tables=("direct_messages", "friend_requests"), target=None):
+        self._url = f"{url.rstrip('/')}/realtime/v1"
+        self._key = key
+        self._tables = tables
+        self._publish = target or publish_row
+        self._thread = None
+        self.stats = {"connected": False, "received": 0, "reconnects": 0, "last_error": ""}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), name="msc-realtime", daemon=True)
+            self._thread.start()
+        return self
+
+    def _on_change(self, payload):
+        try:
+            data = payload.get('data', {})
+            self.stats["received"] += 1
+            self._publish(data.get('table'), data.get('record') or data.get('old_record'), "realtime")
+        except Exception as e: self.stats["last_error"] = str(e)[:200]
+
+    async def _main(self):
+        from realtime import AsyncRealtimeClient  # supabase 的依赖
+        backoff = 1.0
+        while True:
+            client = None
+            try:
+                client = AsyncRealtimeClient(self._url, token=self._key)
+                await client.connect()
+                channel = client.channel("msc-inbox")
+                for table in self._tables:
+                    channel.on_postgres_changes("*", schema="public", table=table, callback=self._on_change)
+                await channel.subscribe()
+                self.stats["connected"], backoff = True, 1.0
+                while client.is_connected: await asyncio.sleep(5)
+            except Exception as e:
+                self.stats["last_error"] = str(e)[:200]
+            self.stats["connected"] = False
+            self.stats["reconnects"] += 1
+            try:
+                if client is not None: await client.close()
+            except: pass
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
@@ -4,7 +4,6 @@ import numpy as np
 import json
 import re
 import time
-import math
 from datetime import datetime, timezone
 from openai import OpenAI
 from google.oauth2 import service_account
@@ -12,6 +11,9 @@ import vertexai
 from vertexai.language_models import TextEmbeddingModel
 import msc_config as config
 import msc_db as db
+import msc_db_async as adb
+import msc_match as match
+import msc_radar as radar_codec
 
 # ==========================================
 # 🛑 1. 初始化系统
@@ -53,7 +55,12 @@ def add_user(u, p, n, c): return db.add_user(u, p, n, c)
 def get_nickname(u): return db.get_nickname(u)
 def get_user_profile(u): return db.get_user_profile(u)
 def update_heartbeat(u): db.update_heartbeat(u)
-def check_is_online(last_seen_str):
+def get_presence_stats(): return db.get_presence_stats()
+def check_is_online(last_seen_str, username=None):
+    # 快速路径：本 worker 内刚活跃过的用户直接判定在线 (数据库里的 last_seen 最多滞后一个 flush 周期)
+    if username:
+        local = db.get_local_last_seen(username)
+        if local and time.time() - local < config.HEARTBEAT_TIMEOUT: return True
     if not last_seen_str: return False
     try:
         if last_seen_str.endswith('Z'): last_seen = datetime.fromisoformat(last_seen_str.replace('Z', '+00:00'))
@@ -63,12 +70,9 @@ def check_is_online(last_seen_str):
     except: return False
 
 def calculate_rank(radar_data):
-    if not radar_data: return "Citizen", "🥉"
-    if isinstance(radar_data, str): 
-        try: radar_data = json.loads(radar_data)
-        except: return "Citizen", "🥉"
-    try: total = sum(float(v) for v in radar_data.values())
-    except: total = 0
+    vec, valid = radar_codec.decode(radar_data)
+    if not valid: return "Citizen", "🥉"
+    total = float(vec.sum())
     if total < 25: return "Observer", "🥉"
     elif total < 38: return "Seeker", "🥈"
     elif total < 54: return "Architect", "💎"
@@ -77,26 +81,85 @@ def calculate_rank(radar_data):
 # 消息与好友
 def save_chat(u, r, c): db.save_chat(u, r, c)
 def get_active_chats(u): return db.get_active_chats(u)
+def get_chat_page(u, before_id=None, after_id=None, limit=None): return db.get_chat_page(u, before_id, after_id, limit)
 def get_all_users(curr): return db.get_all_users(curr) 
-def get_direct_messages(u1, u2): return db.get_direct_messages(u1, u2)
+def get_direct_messages(u1, u2, before_id=None, after_id=None, limit=None): return db.get_direct_messages(u1, u2, before_id, after_id, limit)
 def send_direct_message(s, r, c): return db.send_direct_message(s, r, c)
 def get_unread_counts(c): return db.get_unread_counts(c)
-def mark_messages_read(s, r): db.mark_read(s, r)
 def send_friend_request(s, r, m, meta): return db.send_friend_request(s, r, m, meta)
 def get_pending_requests(u): return db.get_pending_requests(u)
-def handle_friend_request(rid, act): return db.handle_friend_request(rid, act)
 def get_my_friends(u): return db.get_my_friends(u)
 
+def mark_messages_read(s, r):
+    db.mark_read(s, r)
+    box = st.session_state.get("inbox")
+    if box and box["user"] == r: box["unread"].pop(s, None)
+
+def handle_friend_request(rid, act):
+    ok = db.handle_friend_request(rid, act)
+    box = st.session_state.get("inbox")
+    if ok and box and rid in box["requests"]:
+        if act == 'accepted': box["requests"][rid] = dict(box["requests"][rid], status=act)
+        else: box["requests"].pop(rid)
+    return ok
+
+# 会话首屏：资料 / 节点数 / 节点摘要在后台并发获取，同时在脚本线程同步收件箱
+def get_session_bootstrap(username):
+    pending = db.prefetch_session_bootstrap(username)
+    inbox = sync_inbox(username)
+    return dict(pending.result(), inbox=inbox)
+
+# 推送：只读本地 Hub (内存)
+def poll_push(u, since=0): return db.poll_push(u, since)
+def get_push_cursor(): return db.get_push_cursor()
+def is_push_live(): return db.is_push_live()
+def get_push_stats(): return db.get_push_stats()
+
+# 收件箱：会话内维护计数，每次 rerun 只按游标拉取增量
+def sync_inbox(username):
+    """返回 {"total_unread", "unread": {sender: n}, "pending": [...], "friends": [...]}"""
+    box = st.session_state.get("inbox")
+    if not box or box["user"] != username or time.time() - box["synced_at"] > config.INBOX_RESYNC_SECONDS:
+        box = {"user": username, "unread": {}, "requests": {}, "dm_cursor": 0, "fr_cursor": 0, "synced_at": time.time()}
+        st.session_state.inbox = box
+    watch = [rid for rid, r in box["requests"].items() if r['status'] == 'pending' and r['sender'] == username]
+    box["push_cursor"] = db.get_push_cursor()  # 此序号之前的推送事件已包含在本次同步中
+    delta = db.get_inbox(username, box["dm_cursor"], box["fr_cursor"], watch)
+    for sender, n in delta["unread"].items(): box["unread"][sender] = box["unread"].get(sender, 0) + n
+    for r in delta["requests"]:
+        if r['status'] in ('pending', 'accepted'): box["requests"][r['id']] = r
+        else: box["requests"].pop(r['id'], None)
+    box["dm_cursor"], box["fr_cursor"] = delta["dm_cursor"], delta["fr_cursor"]
+
+    reqs = sorted(box["requests"].values(), key=lambda r: r['id'])
+    return {
+        "total_unread": sum(box["unread"].values()),
+        "unread": dict(box["unread"]),
+        "pending": [r for r in reqs if r['status'] == 'pending' and r['receiver'] == username],
+        "friends": [
+            {'username': r['receiver'] if r['sender'] == username else r['sender'], 'metaphor': r['metaphor']}
+            for r in reqs if r['status'] == 'accepted'
+        ]
+    }
+
 # 节点
 def save_node(u, c, d, m, v): return db.save_node(u, c, d, m, v)
-def get_active_nodes_map(u): return db.get_active_nodes_map(u)
-def get_all_nodes_for_map(u): return db.get_all_nodes_for_map(u)
-def get_global_nodes(): return db.get_global_nodes()
-def get_system_logs(): return db.get_system_logs() 
+def get_active_nodes_map(u, with_vectors=False): return db.get_active_nodes_map(u, with_vectors)
+def get_all_nodes_for_map(u, with_vectors=False): return db.get_all_nodes_for_map(u, with_vectors)
+def get_global_nodes(with_vectors=False): return db.get_global_nodes(with_vectors)
+def get_archived_nodes(u): return db.get_archived_nodes(u)
+def get_global_embeddings(): return db.get_global_embeddings()
+def get_system_logs(limit=50): return db.get_system_logs(limit)
+def get_log_pipeline_stats(): return db.get_log_pipeline_stats()
+def get_db_pool_stats(): return db.get_db_pool_stats()
+def get_request_stats(): return db.get_request_stats()
+
+def count_nodes(u=None, mode=None, estimated=False, include_archive=False): return db.count_nodes(u, mode, estimated, include_archive)
+def count_users(): return db.count_users()
 
 def check_world_access(username):
-    nodes = db.get_all_nodes_for_map(username)
-    return len(nodes) >= config.WORLD_UNLOCK_THRESHOLD, len(nodes)
+    count = db.count_nodes(username, include_archive=True)
+    return count >= config.WORLD_UNLOCK_THRESHOLD, count
 
 # 🟢 永久升空检查 (Fixed)
 def check_if_ascended_permanently(username):
@@ -104,53 +167,32 @@ def check_if_ascended_permanently(username):
 
 # 🟢 记录升空事件 (Fixed)
 def log_ascension_event(username):
-    db.log_system_event("INFO", "ASCENSION_EVENT", "User unlocked world layer", user=username)
+    db.log_system_event("INFO", "ASCENSION_EVENT", "User unlocked world layer", user=username, sync=True)
 
 # ==========================================
 # 🟢 3. 社交匹配算法 (Top Near & Far)
 # ==========================================
+@st.cache_resource(ttl=60, show_spinner=False)
+def get_radar_index():
+    """全体用户雷达矩阵 (每 60 秒重建一次，所有会话共享)"""
+    return match.build_radar_index(db.get_all_users(""))
+
 def get_match_candidates(current_username):
     """
     返回: { 'near': [Top5 Users], 'far': [Top5 Users] }
     """
-    candidates = db.get_all_users(current_username)
-    if not candidates: return {'near':[], 'far':[]}
+    index = get_radar_index()
+    if not index['users']: return {'near':[], 'far':[]}
 
     my_profile = db.get_user_profile(current_username)
-    my_radar_str = my_profile.get('radar_profile')
-    my_radar = json.loads(my_radar_str) if isinstance(my_radar_str, str) else (my_radar_str or {})
-    
-    scored_users = []
-    axes = config.RADAR_AXES
-    
-    for user in candidates:
-        # 🟢 核心修正：过滤掉未突破阈值的用户 (Node < 20)
-        target_nodes = db.get_all_nodes_for_map(user['username'])
-        if len(target_nodes) < config.WORLD_UNLOCK_THRESHOLD:
-            continue
-
-        u_radar = json.loads(user['radar_profile']) if isinstance(user.get('radar_profile'), str) else (user.get('radar_profile') or {})
-        dist_sq = 0
-        valid_data = False
-        
-        for axis in axes:
-            v1 = float(my_radar.get(axis, 3.0))
-            v2 = float(u_radar.get(axis, 3.0))
-            dist_sq += (v1 - v2) ** 2
-            if u_radar: valid_data = True
-            
-        distance = math.sqrt(dist_sq)
-        if not valid_data: distance = 999 
-        scored_users.append((user, distance))
-
-    scored_users.sort(key=lambda x: x[1])
-    
-    valid_users = [x for x in scored_users if x[1] < 100]
-    if not valid_users: valid_users = scored_users
+    my_vec = radar_codec.to_vector(my_profile.get('radar_profile'))
 
-    near_list = [item[0] for item in valid_users[:5]]
-    far_list = [item[0] for item in reversed(valid_users[-5:])]
+    # 🟢 核心修正：过滤掉未突破阈值的用户 (Node < 20)，一次查询得到全部计数
+    counts = db.get_node_count_index()
+    node_counts = np.fromiter((counts.get(u, 0) for u in index['usernames']), dtype=np.int64, count=len(index['usernames']))
+    mask = (index['usernames'] != current_username) & (node_counts >= config.WORLD_UNLOCK_THRESHOLD)
 
+    near_list, far_list = match.match_near_far(index, my_vec, mask, k=5)
     return {'near': near_list, 'far': far_list}
 
 # ==========================================
@@ -183,7 +225,7 @@ def get_stream_response(history_messages):
         lang_instruction = "Reply in Chinese." if lang == 'zh' else "Reply in English."
         system_prompt = config.PROMPT_CHATBOT + f"\n[CURRENT LANGUAGE INSTRUCTION]: {lang_instruction}"
         api_messages = [{"role": "system", "content": system_prompt}]
-        for msg in history_messages: 
+        for msg in history_messages[-config.CHAT_CONTEXT_SIZE:]: 
             if msg['role'] in ['user', 'assistant']: api_messages.append({"role": msg["role"], "content": msg["content"]})
         stream = client_ai.chat.completions.create(model=TARGET_MODEL, messages=api_messages, temperature=0.8, stream=True)
         for chunk in stream:
@@ -215,7 +257,7 @@ def analyze_meaning_background(text):
 
 def generate_daily_question(username, radar_data):
     lang = st.session_state.get('language', 'en')
-    radar_str = json.dumps(radar_data, ensure_ascii=False)
+    radar_str = json.dumps(radar_codec.to_dict(radar_data), ensure_ascii=False)
     lang_instruction = "Output the question strictly in Simplified Chinese." if lang == 'zh' else "Output the question strictly in English."
     prompt = f"{config.PROMPT_DAILY}\nUser Data: {radar_str}\n[CRITICAL]: {lang_instruction}"
     res = call_ai_api(prompt)
@@ -223,8 +265,8 @@ def generate_daily_question(username, radar_data):
 
 def generate_relationship_metaphor(u_self, u_target, match_type):
     lang = st.session_state.get('language', 'en')
-    p1 = db.get_user_profile(u_self); r1 = p1.get('radar_profile', {})
-    p2 = db.get_user_profile(u_target); r2 = p2.get('radar_profile', {})
+    p1, p2 = adb.gather(adb.get_user_profile(u_self), adb.get_user_profile(u_target))
+    r1 = radar_codec.to_dict(p1.get('radar_profile')); r2 = radar_codec.to_dict(p2.get('radar_profile'))
     data_str = f"User A: {r1}\nUser B: {r2}\nMatch Type: {match_type}"
     lang_instr = "ZH" if lang == 'zh' else "EN"
     prompt = f"{config.PROMPT_METAPHOR}\nDATA:\n{data_str}\nTARGET_LANG: {lang_instr}"
@@ -233,33 +275,34 @@ def generate_relationship_metaphor(u_self, u_target, match_type):
     return res.get("metaphor", fallback)
 
 def update_radar_score(username, input_scores):
-    try:
-        user_data = db.get_user_profile(username)
-        current = user_data.get('radar_profile')
-        default_radar = {k: 3.0 for k in config.RADAR_AXES}
-        if not current: current = default_radar
-        elif isinstance(current, str): 
-            try:
-                current_dict = json.loads(current)
-                for k in config.RADAR_AXES:
-                    if k not in current_dict: current_dict[k] = 3.0
-                current = current_dict
-            except: current = default_radar
-        updated = {}
-        alpha = config.RADAR_ALPHA
-        for k in config.RADAR_AXES:
-            old_val = float(current.get(k, 3.0))
-            if k in input_scores: new_val = old_val * (1 - alpha) + float(input_scores[k]) * alpha + 0.5 
-            else: new_val = old_val 
-            updated[k] = round(min(10.0, new_val), 2)
-        db.update_radar_score(username, json.dumps(updated))
+    """input_scores: 本轮各轴分数 (dict 或 JSON 字符串)，EMA 融合由 db 原子完成"""
+    try: return db.update_radar_score(username, input_scores)
+    except Exception as e: print(f"Radar Update Error: {e}")
+
+def apply_radar_deltas(updates):
+    """批量雷达融合：[(username, scores)]，一次调用"""
+    try: return db.apply_radar_deltas(updates)
     except Exception as e: print(f"Radar Update Error: {e}")
+    return {}
+
+def commit_turn(username, prompt, response, analysis=None, vector=None, mode="AI对话"):
+    """
+    一轮对话的写入 (两条 chat / 意义节点 / 雷达) 合并为一次提交
+    response 为空时只提交节点与雷达 (页面先在流式回复结束后单独提交两条 chat)
+    """
+    chats = [{"role": "user", "content": prompt}, {"role": "assistant", "content": response}] if response else []
+    node = radar_scores = None
+    if analysis and analysis.get("valid", False):
+        node = (prompt, analysis, mode, vector)
+        if isinstance(analysis.get("radar_scores"), dict): radar_scores = analysis["radar_scores"]
+    return db.commit_turn(username, chats, node, radar_scores)
 
 def analyze_persona_report(radar_data):
     lang = st.session_state.get('language', 'en')
-    radar_str = json.dumps(radar_data, ensure_ascii=False)
+    radar_str = json.dumps(radar_codec.to_dict(radar_data), ensure_ascii=False)
     lang_instruction = "Output the analysis in Simplified Chinese." if lang == 'zh' else "Output the analysis in English."
     prompt = f"{config.PROMPT_PROFILE}\nDATA: {radar_str}\n[INSTRUCTION]: {lang_instruction}"
     return call_ai_api(prompt)
 
-def process_time_decay(): return db.process_time_decay()
+def process_time_decay(batch_size=None): return db.process_time_decay(batch_size)
+def archive_sediment_nodes(): return db.archive_sediment_nodes()
@@ -0,0 +1,93 @@
+import time
+import queue
+import atexit
+import random
+import threading
+
+# ==========================================
+# 📮 异步批量日志管道 (Log Pipeline)
+# ==========================================
+# submit() 只做一次非阻塞入队，绝不在请求路径上等待网络
+# 后台线程按 batch_size 或 flush_interval 批量写入 sink(rows)
+# 队列满 / 被采样丢弃的记录计入 stats，进程退出时同步 flush
+
+class LogPipeline:
+    def __init__(self, sink, max_queue=5000, batch_size=100, flush_interval=2.0, sample_rates=None):
+        self._sink = sink
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._sample_rates = sample_rates or {}
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0, "dropped_full": 0, "dropped_sampled": 0}
+        atexit.register(self.close)
+
+    def submit(self, record):
+        rate = self._sample_rates.get(record.get('level'), 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self.stats["dropped_sampled"] += 1
+            return False
+        self._ensure_thread()
+        try: self._queue.put_nowait(record)
+        except queue.Full:
+            self.stats["dropped_full"] += 1
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive(): return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="msc-log-flusher", daemon=True)
+                self._thread.start()
+
+    def _write(self, batch):
+        if not batch: return
+        try:
+            self._sink(batch)
+            self.stats["written"] += len(batch)
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            print(f"Log Flush Error: {e}")
+        self.stats["batches"] += 1
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self._flush_interval
+        while not self._stop.is_set():
+            try: item = self._queue.get(timeout=max(0.05, deadline - time.monotonic()))
+            except queue.Empty: item = None
+            if isinstance(item, threading.Event):  # flush() 的同步标记
+                self._write(batch); batch = []
+                item.set()
+            elif item is not None:
+                batch.append(item)
+            if len(batch) >= self._batch_size or time.monotonic() >= deadline:
+                self._write(batch); batch = []
+                deadline = time.monotonic() + self._flush_interval
+        self._write(batch)
+
+    def flush(self, timeout=5.0):
+        """同步写出队列中的全部记录 (退出时 / 需要立即读到日志时)"""
+        if self._thread is not None and self._thread.is_alive():
+            done = threading.Event()
+            try:
+                self._queue.put(done, timeout=timeout)
+                return done.wait(timeout)
+            except queue.Full: return False
+        batch = []
+        while True:
+            try: item = self._queue.get_nowait()
+            except queue.Empty: break
+            if isinstance(item, threading.Event): item.set()
+            else: batch.append(item)
+            if len(batch) >= self._batch_size: self._write(batch); batch = []
+        self._write(batch)
+        return True
+
+    def close(self):
+        self.flush()
+        self._stop.set()
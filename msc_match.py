@@ -0,0 +1,55 @@
+import numpy as np
+import msc_radar as radar_codec
+
+# ==========================================
+# 🧭 1. 雷达矩阵 (Radar Matrix)
+# ==========================================
+def build_radar_index(users):
+    """
+    一次性解析所有用户雷达，得到连续矩阵 (users x RADAR_AXES)
+    valid[i] = False 表示该用户没有雷达数据 (旧逻辑中的 distance = 999)
+    """
+    users = users or []
+    matrix = np.full((len(users), radar_codec.DIM), radar_codec.DEFAULT_SCORE)
+    valid = np.zeros(len(users), dtype=bool)
+    for i, user in enumerate(users):
+        matrix[i], valid[i] = radar_codec.decode(user.get('radar_profile'))
+    return {
+        "users": users,
+        "usernames": np.array([u['username'] for u in users], dtype=object),
+        "matrix": np.ascontiguousarray(matrix),
+        "valid": valid
+    }
+
+# ==========================================
+# 🎯 2. Top-K 近/远 (Near & Far)
+# ==========================================
+def _top_k(scores, k):
+    """返回 scores 最小的 k 个下标 (已排序)，用 argpartition 代替全排序"""
+    if k <= 0: return np.empty(0, dtype=np.intp)
+    if k < scores.size: idx = np.argpartition(scores, k - 1)[:k]
+    else: idx = np.arange(scores.size)
+    return idx[np.argsort(scores[idx], kind='stable')]
+
+def match_near_far(index, my_vec, mask=None, k=5):
+    """
+    单次向量化计算所有欧氏距离
+    mask: 候选过滤 (如排除自己、未解锁用户)
+    返回: (near_users, far_users)
+    """
+    matrix, valid = index['matrix'], index['valid']
+    candidates = np.arange(matrix.shape[0]) if mask is None else np.flatnonzero(mask)
+    if candidates.size == 0: return [], []
+
+    # 有雷达数据的用户优先；全部无效时退回全部候选
+    pool = candidates[valid[candidates]]
+    if pool.size == 0: pool = candidates
+
+    diff = matrix[pool] - my_vec
+    dist = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+
+    k = min(k, pool.size)
+    near = pool[_top_k(dist, k)]
+    far = pool[_top_k(-dist, k)]
+    users = index['users']
+    return [users[i] for i in near], [users[i] for i in far]
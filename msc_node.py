@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+import msc_config as config
+
+# ==========================================
+# 🧩 意义节点模型 (Node)
+# ==========================================
+# nodes 行在读取时解码一次：keywords (JSON 文本 → list)、location (JSON 文本 → dict)、
+# created_at (ISO 文本 → datetime)，光谱颜色也在这里算好
+# 渲染层直接读属性，不再各自 json.loads / fromisoformat；缓存里保存的也是解码后的对象 (只读，不要修改)
+# 兼容旧代码：node['care_point'] / node.get('care_point', default) 仍可用，键名与数据库列一致
+DEFAULT_COLOR = "#607D8B"  # Nihilism
+
+def spectrum_color(keywords):
+    """关键词 → 光谱颜色：先按维度名匹配，再按颜色值匹配"""
+    if not keywords: return DEFAULT_COLOR
+    text = keywords if isinstance(keywords, str) else " ".join(str(k) for k in keywords)
+    for dim, color in config.SPECTRUM.items():
+        if dim in text: return color
+    for color in config.SPECTRUM.values():
+        if color in text: return color
+    return DEFAULT_COLOR
+
+def _parse_json(raw, kind):
+    if isinstance(raw, kind): return raw
+    if isinstance(raw, str) and raw:
+        try:
+            value = json.loads(raw)
+            if isinstance(value, kind): return value
+        except: pass
+    return None
+
+def _parse_time(raw):
+    if isinstance(raw, datetime): return raw
+    if not isinstance(raw, str) or not raw: return None
+    try: return datetime.fromisoformat(raw.replace('Z', '+00:00'))
+    except: return None
+
+class Node:
+    __slots__ = ("id", "username", "content", "care_point", "meaning_layer", "insight", "mode", "logic_score",
+                 "keywords", "location", "is_deleted", "created_at", "created_label", "color", "vector")
+
+    def __init__(self, row):
+        self.id = row.get('id')
+        self.username = row.get('username')
+        self.content = row.get('content') or ""
+        self.care_point = row.get('care_point') or ""
+        self.meaning_layer = row.get('meaning_layer') or ""
+        self.insight = row.get('insight') or ""
+        self.mode = row.get('mode') or "Active"
+        try: self.logic_score = float(row.get('logic_score'))
+        except: self.logic_score = None
+        self.keywords = _parse_json(row.get('keywords'), list) or []
+        self.location = _parse_json(row.get('location'), dict)
+        self.is_deleted = bool(row.get('is_deleted'))
+        self.created_at = _parse_time(row.get('created_at'))
+        self.created_label = self.created_at.strftime("%Y-%m-%d %H:%M") if self.created_at else ""
+        self.color = spectrum_color(self.keywords)
+        self.vector = row.get('vector')  # 只有 with_vectors 读取时才有；由 msc_vec 批量解码
+
+    @property
+    def primary_keyword(self):
+        return self.keywords[0] if self.keywords else None
+
+    @property
+    def lat_lon(self):
+        """(lat, lon)；没有有效位置时为 None"""
+        loc = self.location
+        if not loc or not loc.get('lat'): return None
+        return loc.get('lat'), loc.get('lon')
+
+    # ---- 兼容 dict 访问 ----
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        if key not in self.__slots__: raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"Node(id={self.id}, username={self.username!r}, care_point={self.care_point!r})"
+
+def from_rows(rows):
+    return [Node(r) for r in rows or []]
@@ -17,8 +17,8 @@ def render_onboarding(username):
 def render_ai_page(username):
     page_ai.render_ai_page(username)
 
-def render_friends_page(username, unread_counts):
-    page_social.render_friends_page(username, unread_counts)
+def render_friends_page(username, inbox):
+    page_social.render_friends_page(username, inbox)
 
 # 关键在这里，确保这里调用的是 page_social.render_world_page()
 def render_world_page():
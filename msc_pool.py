@@ -0,0 +1,123 @@
+import time
+import queue
+import asyncio
+import random
+import threading
+from contextlib import contextmanager
+
+# ==========================================
+# 🔗 数据库客户端池 (Client Pool)
+# ==========================================
+# 每个客户端独占一个 keep-alive 的 HTTP 连接池；会话线程借出 / 归还，互不共享
+# execute(build) 负责：借出客户端 → build(client).execute() → 统计耗时
+# 幂等调用 (读 / 按条件的 update、delete) 遇到传输层错误时在时间预算内带抖动重试
+# aexecute 是异步版本：同一套重试 / 时间预算 / 统计，客户端由调用方提供 (异步客户端自带多路复用连接池)
+
+class PoolTimeout(Exception):
+    pass
+
+class ClientPool:
+    def __init__(self, factory, size=4, retries=2, backoff=0.2, deadline=15.0, retry_on=(Exception,)):
+        self._factory = factory
+        self._size = size
+        self._retries = retries
+        self._backoff = backoff
+        self._deadline = deadline
+        self._retry_on = retry_on
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.metrics = {
+            "size": size, "created": 0, "in_use": 0, "calls": 0, "retries": 0,
+            "failures": 0, "checkout_timeouts": 0, "total_ms": 0.0, "max_wait_ms": 0.0, "last_error": ""
+        }
+
+    def _checkout(self, deadline):
+        try: return self._idle.get_nowait()
+        except queue.Empty: pass
+        with self._lock:
+            if self._created < self._size:
+                self._created += 1
+                self.metrics["created"] = self._created
+                create = True
+            else: create = False
+        if create:
+            try: return self._factory()
+            except:
+                with self._lock:
+                    self._created -= 1
+                    self.metrics["created"] = self._created
+                raise
+        try: return self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            self.metrics["checkout_timeouts"] += 1
+            raise PoolTimeout("No database client available before deadline")
+
+    @contextmanager
+    def client(self, deadline=None):
+        deadline = deadline or time.monotonic() + self._deadline
+        started = time.monotonic()
+        client = self._checkout(deadline)
+        self.metrics["max_wait_ms"] = max(self.metrics["max_wait_ms"], (time.monotonic() - started) * 1000)
+        with self._lock: self.metrics["in_use"] += 1
+        try: yield client
+        finally:
+            with self._lock: self.metrics["in_use"] -= 1
+            self._idle.put(client)
+
+    def _retry_delay(self, e, attempt, attempts, deadline):
+        """可重试错误后的等待秒数；次数或时间预算用尽时返回 None (调用方重新抛出)"""
+        self.metrics["last_error"] = f"{type(e).__name__}: {e}"[:200]
+        delay = self._backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        if attempt + 1 >= attempts or time.monotonic() + delay >= deadline: return None
+        self.metrics["retries"] += 1
+        return delay
+
+    def execute(self, build, idempotent=False, deadline=None):
+        """build(client) 返回 postgrest 查询；幂等调用失败时在 deadline 内重试"""
+        deadline = time.monotonic() + (deadline or self._deadline)
+        attempts = 1 + (self._retries if idempotent else 0)
+        started = time.monotonic()
+        self.metrics["calls"] += 1
+        try:
+            for attempt in range(attempts):
+                try:
+                    with self.client(deadline) as client:
+                        return build(client).execute()
+                except self._retry_on as e:
+                    delay = self._retry_delay(e, attempt, attempts, deadline)
+                    if delay is None: raise
+                    time.sleep(delay)
+        except Exception as e:
+            self.metrics["failures"] += 1
+            self.metrics["last_error"] = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            self.metrics["total_ms"] += (time.monotonic() - started) * 1000
+
+    async def aexecute(self, call, idempotent=False, deadline=None):
+        """call() 返回一个协程 (如 build(async_client).execute())；重试与统计同 execute"""
+        deadline = time.monotonic() + (deadline or self._deadline)
+        attempts = 1 + (self._retries if idempotent else 0)
+        started = time.monotonic()
+        self.metrics["calls"] += 1
+        try:
+            for attempt in range(attempts):
+                try: return await call()
+                except self._retry_on as e:
+                    delay = self._retry_delay(e, attempt, attempts, deadline)
+                    if delay is None: raise
+                    await asyncio.sleep(delay)
+        except Exception as e:
+            self.metrics["failures"] += 1
+            self.metrics["last_error"] = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            self.metrics["total_ms"] += (time.monotonic() - started) * 1000
+
+    def stats(self):
+        out = dict(self.metrics)
+        out["idle"] = self._idle.qsize()
+        out["avg_ms"] = round(out.pop("total_ms") / out["calls"], 1) if out["calls"] else 0.0
+        out["max_wait_ms"] = round(out["max_wait_ms"], 1)
+        return out
@@ -0,0 +1,63 @@
+import time
+import atexit
+import threading
+
+# ==========================================
+# 💓 在线状态 (Presence Tracker)
+# ==========================================
+# touch() 只更新内存里的 last_seen，不访问数据库
+# 后台线程每 flush_interval 秒把这段时间内活跃过的用户合并成一次批量写入 sink(usernames, ts)
+# flush_interval 应远小于 HEARTBEAT_TIMEOUT，保证其它 worker 从数据库读到的状态不过期
+
+class PresenceTracker:
+    def __init__(self, sink, flush_interval=60.0):
+        self._sink = sink
+        self._flush_interval = flush_interval
+        self._seen = {}    # username -> 本进程最后一次活跃 (epoch)
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {"touches": 0, "flushes": 0, "written": 0, "failed": 0}
+        atexit.register(self.close)
+
+    def touch(self, username):
+        if not username: return
+        with self._lock:
+            self._seen[username] = time.time()
+            self._dirty.add(username)
+        self.stats["touches"] += 1
+        self._ensure_thread()
+
+    def last_seen(self, username):
+        """本进程内最后活跃时间 (epoch)；未见过返回 None"""
+        return self._seen.get(username)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive(): return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="msc-presence", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._flush_interval): self.flush()
+
+    def flush(self):
+        with self._lock:
+            users, self._dirty = sorted(self._dirty), set()
+            ts = max([self._seen[u] for u in users], default=0)
+        if not users: return 0
+        try:
+            self._sink(users, ts)
+            self.stats["written"] += len(users)
+        except Exception as e:
+            self.stats["failed"] += len(users)
+            with self._lock: self._dirty.update(users)  # 下一轮重试
+            print(f"Presence Flush Error: {e}")
+        self.stats["flushes"] += 1
+        return len(users)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
@@ -0,0 +1,62 @@
+import json
+import numpy as np
+import msc_config as config
+
+# ==========================================
+# 🧭 雷达编解码 (Radar Codec)
+# ==========================================
+# 内存: float64 数组，长度与顺序固定为 config.RADAR_AXES
+# 存储 (users.radar_profile): JSON 数组文本 "[8.0, 5.0, ...]"，第 i 个值对应 RADAR_AXES[i]
+# 旧格式: JSON 对象 {"Care": 8, ...} 继续兼容；缺失轴取 DEFAULT_SCORE，不在 RADAR_AXES 中的键 (如 Empathy) 被丢弃
+# 只在数据库边界 (decode / encode) 和需要轴名的地方 (to_dict：AI prompt) 做转换，匹配 / 排名 / 渲染直接用数组
+AXES = tuple(config.RADAR_AXES)
+AXIS_INDEX = {axis: i for i, axis in enumerate(AXES)}
+DIM = len(AXES)
+DEFAULT_SCORE = 3.0
+MAX_SCORE = 10.0
+
+def default():
+    return np.full(DIM, DEFAULT_SCORE)
+
+def decode(raw):
+    """radar_profile (数组文本 / 旧 JSON 对象 / list / dict / ndarray) → (vec, valid)；valid=False 表示没有雷达数据"""
+    if isinstance(raw, np.ndarray) and raw.shape == (DIM,): return raw, True
+    if isinstance(raw, str):
+        try: raw = json.loads(raw)
+        except: raw = None
+    vec = default()
+    if isinstance(raw, dict):
+        for axis, value in raw.items():
+            i = AXIS_INDEX.get(axis)
+            if i is None: continue
+            try: vec[i] = float(value)
+            except: pass
+        return vec, bool(raw)
+    if isinstance(raw, (list, tuple)) and len(raw) == DIM:
+        try: return np.array(raw, dtype=np.float64), True
+        except: pass
+    return vec, False
+
+def to_vector(raw):
+    return decode(raw)[0]
+
+def encode(vec):
+    """数组 → 存储文本 (两位小数)"""
+    return json.dumps([round(float(v), 2) for v in vec])
+
+def to_dict(raw):
+    """{axis: score}，给 AI prompt 等需要轴名的地方"""
+    return {axis: round(float(v), 2) for axis, v in zip(AXES, to_vector(raw))}
+
+def blend(current, scores, alpha=None):
+    """
+    在当前雷达上按 RADAR_ALPHA 做一次 EMA 融合：new = old * (1 - α) + score * α + 0.5，上限 10
+    scores 是分析得到的 {axis: score} (只融合出现的轴)；与服务端 msc_apply_radar_deltas 同一公式
+    """
+    alpha = config.RADAR_ALPHA if alpha is None else alpha
+    vec = to_vector(current).copy()
+    for axis, score in scores.items():
+        i = AXIS_INDEX.get(axis)
+        if i is None: continue
+        vec[i] = vec[i] * (1 - alpha) + float(score) * alpha + 0.5
+    return np.round(np.minimum(vec, MAX_SCORE), 2)
@@ -68,6 +68,7 @@ TOPICS = [
 def create_virtual_citizens():
     created_count = 0
     logs = []
+    radar_updates = []  # 所有灵魂参数最后一次批量提交
     
     for char in ARCHETYPES:
         username = f"sim_{char['nickname'].lower()}"
@@ -77,14 +78,15 @@ def create_virtual_citizens():
         # 尝试注册
         if msc.add_user(username, "123456", char['nickname'], city_name):
             # 注入灵魂参数 (Radar)
-            msc.update_radar_score(username, char['radar'])
+            radar_updates.append((username, char['radar']))
             created_count += 1
             logs.append(f"✅ Created: {char['nickname']} in {city_name}")
         else:
             # 如果已存在，也要更新一下 Radar，防止是旧数据
-            msc.update_radar_score(username, char['radar'])
+            radar_updates.append((username, char['radar']))
             logs.append(f"🔄 Updated: {char['nickname']} (Already exists)")
-            
+    
+    msc.apply_radar_deltas(radar_updates)
     return logs
 
 # ==========================================
@@ -5,12 +5,12 @@ import streamlit_antd_components as sac
 import msc_transformer as trans  # <--- 变动在这里
 import json
 
-def render_soul_scene(radar_dict, user_nodes=None):
+def render_soul_scene(radar_data, user_nodes=None):
     if user_nodes is None: user_nodes = []
     
     try: 
         # 调用新文件的方法
-        payload, p_attr, s_attr = trans.prepare_soul_data(radar_dict, user_nodes)
+        payload, p_attr, s_attr = trans.prepare_soul_data(radar_data, user_nodes)
     except: return
         
     payload_json = json.dumps(payload)
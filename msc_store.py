@@ -0,0 +1,384 @@
+import os
+import re
+import json
+import uuid
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import msc_radar as radar_codec
+
+# ==========================================
+# 🗃️ 本地存储后端 (SQLite Store)
+# ==========================================
+# 与 supabase 客户端同形：client.table(name).select(...).eq(...).order(...).execute()
+# msc_db 的查询代码不区分后端；只实现 msc_db 实际用到的 PostgREST 子集：
+#   select(cols, count, head) / insert / update(count) / upsert / delete
+#   eq / neq / lt / lte / gt / gte / in_ / or_("and(a.eq.x,b.eq.y),...") / order / limit / range
+#   rpc(name, params)：RPC 表中注册的 Python 实现 (与 Supabase 上的 SQL 函数对应)
+# WAL 模式：一个写者 + 多个读者并发；适合离线测试、压测和单机小规模部署
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+# 列类型: int / real / text / bool / json；bool 存 0/1，json 存文本，读出时还原
+_NODE_COLUMNS = {
+    "id": "int", "username": "text", "content": "text", "care_point": "text",
+    "meaning_layer": "text", "insight": "text", "mode": "text", "vector": "text",
+    "logic_score": "real", "keywords": "text", "location": "json",
+    "is_deleted": "bool", "created_at": "text"
+}
+
+SCHEMA = {
+    "users": {
+        "id": "int", "username": "text", "password": "text", "nickname": "text",
+        "radar_profile": "text", "country": "text", "last_seen": "text", "uid": "text", "created_at": "text"
+    },
+    "nodes": _NODE_COLUMNS,
+    "nodes_archive": _NODE_COLUMNS,
+    "chats": {"id": "int", "username": "text", "role": "text", "content": "text", "is_deleted": "bool", "created_at": "text"},
+    "direct_messages": {"id": "int", "sender": "text", "receiver": "text", "content": "text", "is_read": "bool", "created_at": "text"},
+    "friend_requests": {
+        "id": "int", "sender": "text", "receiver": "text", "status": "text",
+        "match_type": "text", "metaphor": "text", "created_at": "text"
+    },
+    "system_logs": {"id": "int", "level": "text", "component": "text", "message": "text", "user_id": "text", "created_at": "text"},
+}
+
+# insert 时缺省值 (对应 Supabase 表上的 default)
+DEFAULTS = {
+    "created_at": _now,
+    "is_deleted": lambda: False,
+    "is_read": lambda: False,
+    "uid": lambda: uuid.uuid4().hex[:8],
+}
+
+INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users (username)",
+    "CREATE INDEX IF NOT EXISTS idx_nodes_user ON nodes (username, is_deleted)",
+    "CREATE INDEX IF NOT EXISTS idx_nodes_live ON nodes (is_deleted, id)",
+    "CREATE INDEX IF NOT EXISTS idx_nodes_mode_created ON nodes (mode, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_nodes_archive_user ON nodes_archive (username, is_deleted)",
+    "CREATE INDEX IF NOT EXISTS idx_chats_user ON chats (username, is_deleted, id)",
+    "CREATE INDEX IF NOT EXISTS idx_dm_pair ON direct_messages (sender, receiver, id)",
+    "CREATE INDEX IF NOT EXISTS idx_dm_unread ON direct_messages (receiver, is_read)",
+    "CREATE INDEX IF NOT EXISTS idx_fr_sender ON friend_requests (sender, status)",
+    "CREATE INDEX IF NOT EXISTS idx_fr_receiver ON friend_requests (receiver, status)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_user ON system_logs (user_id, component)",
+    "CREATE INDEX IF NOT EXISTS idx_logs_created ON system_logs (created_at)",
+]
+
+_SQL_TYPES = {"int": "INTEGER", "real": "REAL", "text": "TEXT", "bool": "INTEGER", "json": "TEXT"}
+_OPS = {"eq": "=", "neq": "!=", "lt": "<", "lte": "<=", "gt": ">", "gte": ">="}
+_IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+class StoreError(Exception):
+    pass
+
+class Result:
+    """与 postgrest 的 APIResponse 同名字段"""
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+def _ident(name):
+    name = name.strip()
+    if not _IDENT.match(name): raise StoreError(f"Invalid identifier: {name!r}")
+    return f'"{name}"'
+
+def _encode(kind, value):
+    if value is None: return None
+    if kind == "bool": return 1 if value else 0
+    if isinstance(value, (dict, list)): return json.dumps(value, ensure_ascii=False)
+    return value
+
+def _decode(kind, value):
+    if value is None: return None
+    if kind == "bool": return bool(value)
+    if kind == "json":
+        try: return json.loads(value)
+        except: return value
+    return value
+
+def create_schema(conn):
+    for table, columns in SCHEMA.items():
+        cols = ", ".join(
+            f'"{name}" INTEGER PRIMARY KEY AUTOINCREMENT' if name == "id" else f'"{name}" {_SQL_TYPES[kind]}'
+            for name, kind in columns.items()
+        )
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({cols})')
+    for sql in INDEXES: conn.execute(sql)
+
+# ==========================================
+# 🔍 查询构造器 (Query Builder)
+# ==========================================
+class _Query:
+    def __init__(self, client, table):
+        if table not in SCHEMA: raise StoreError(f"Unknown table: {table}")
+        self._client = client
+        self._table = table
+        self._columns = SCHEMA[table]
+        self._action = "select"
+        self._fields = "*"
+        self._values = None
+        self._count = None
+        self._head = False
+        self._returning = True
+        self._where = []  # [(sql, params)]
+        self._order = []
+        self._limit = None
+        self._offset = None
+
+    # ---- 动作 ----
+    def select(self, columns="*", count=None, head=False):
+        self._action, self._fields, self._count, self._head = "select", columns, count, head
+        return self
+
+    def insert(self, rows, returning="representation", **_):
+        self._action, self._values, self._returning = "insert", rows, returning != "minimal"
+        return self
+
+    def upsert(self, rows, returning="representation", **_):
+        self._action, self._values, self._returning = "upsert", rows, returning != "minimal"
+        return self
+
+    def update(self, values, count=None, returning="representation", **_):
+        self._action, self._values, self._count, self._returning = "update", values, count, returning != "minimal"
+        return self
+
+    def delete(self, count=None, returning="representation", **_):
+        self._action, self._count, self._returning = "delete", count, returning != "minimal"
+        return self
+
+    # ---- 过滤 ----
+    def _cond(self, column, op, value):
+        kind = self._columns.get(column.strip(), "text")
+        if op == "in":
+            values = list(value)
+            if not values: return "0", []
+            return f"{_ident(column)} IN ({', '.join('?' * len(values))})", [_encode(kind, v) for v in values]
+        if value is None and op in ("eq", "neq"):
+            return f"{_ident(column)} IS {'NOT ' if op == 'neq' else ''}NULL", []
+        return f"{_ident(column)} {_OPS[op]} ?", [_encode(kind, value)]
+
+    def _filter(self, column, op, value):
+        self._where.append(self._cond(column, op, value))
+        return self
+
+    def eq(self, column, value): return self._filter(column, "eq", value)
+    def neq(self, column, value): return self._filter(column, "neq", value)
+    def lt(self, column, value): return self._filter(column, "lt", value)
+    def lte(self, column, value): return self._filter(column, "lte", value)
+    def gt(self, column, value): return self._filter(column, "gt", value)
+    def gte(self, column, value): return self._filter(column, "gte", value)
+    def in_(self, column, values): return self._filter(column, "in", values)
+    def is_(self, column, value): return self._filter(column, "eq", None if value in (None, "null") else value)
+
+    def or_(self, filters):
+        self._where.append(self._logic("OR", filters))
+        return self
+
+    def _logic(self, joiner, text):
+        parts, params = [], []
+        for item in _split_top(text):
+            m = re.match(r"^(and|or)\((.*)\)$", item)
+            if m: sql, p = self._logic(m.group(1).upper(), m.group(2))
+            else:
+                column, op, value = item.split(".", 2)
+                if op == "in": value = [v.strip() for v in value.strip("()").split(",")]
+                elif value == "null": value = None
+                elif value in ("true", "false"): value = value == "true"
+                sql, p = self._cond(column, op, value)
+            parts.append(f"({sql})")
+            params.extend(p)
+        return f" {joiner} ".join(parts), params
+
+    # ---- 排序 / 分页 ----
+    def order(self, column, desc=False, **_):
+        self._order.append(f"{_ident(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size, **_):
+        self._limit = size
+        return self
+
+    def range(self, start, end, **_):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    # ---- 执行 ----
+    def _where_sql(self):
+        if not self._where: return "", []
+        params = [p for _, ps in self._where for p in ps]
+        return " WHERE " + " AND ".join(f"({sql})" for sql, _ in self._where), params
+
+    def _select_list(self):
+        fields = [f.strip() for f in self._fields.split(",") if f.strip()]
+        if fields == ["*"]: return "*"
+        return ", ".join(_ident(f) for f in fields)
+
+    def _rows(self, cursor):
+        names = [d[0] for d in cursor.description]
+        kinds = [self._columns.get(n, "text") for n in names]
+        return [{n: _decode(k, v) for n, k, v in zip(names, kinds, row)} for row in cursor.fetchall()]
+
+    def _prepare(self, row):
+        row = dict(row)
+        for name, make in DEFAULTS.items():
+            if name in self._columns and row.get(name) is None: row[name] = make()
+        unknown = [k for k in row if k not in self._columns]
+        if unknown: raise StoreError(f"Unknown columns for {self._table}: {unknown}")
+        return row
+
+    def execute(self):
+        conn = self._client.conn
+        table = _ident(self._table)
+        where, params = self._where_sql()
+
+        if self._action == "select":
+            count = None
+            if self._count:
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0]
+                if self._head: return Result([], count)
+            sql = f"SELECT {self._select_list()} FROM {table}{where}"
+            if self._order: sql += " ORDER BY " + ", ".join(self._order)
+            if self._limit is not None or self._offset is not None:
+                sql += f" LIMIT {int(self._limit if self._limit is not None else -1)} OFFSET {int(self._offset or 0)}"
+            return Result(self._rows(conn.execute(sql, params)), count)
+
+        returning = " RETURNING *" if self._returning else ""
+        if self._action in ("insert", "upsert"):
+            rows = self._values if isinstance(self._values, list) else [self._values]
+            if not rows: return Result([], 0)
+            rows = [self._prepare(r) for r in rows]
+            verb = "INSERT OR REPLACE" if self._action == "upsert" else "INSERT"
+            out = []
+            with _transaction(conn):  # 批量写入在一个事务内
+                for row in rows:
+                    names = list(row)
+                    sql = f"{verb} INTO {table} ({', '.join(_ident(n) for n in names)}) VALUES ({', '.join('?' * len(names))}){returning}"
+                    cur = conn.execute(sql, [_encode(self._columns[n], row[n]) for n in names])
+                    if returning: out.extend(self._rows(cur))
+            return Result(out, len(rows))
+
+        if self._action == "update":
+            values = {k: v for k, v in self._values.items()}
+            unknown = [k for k in values if k not in self._columns]
+            if unknown: raise StoreError(f"Unknown columns for {self._table}: {unknown}")
+            sets = ", ".join(f"{_ident(k)} = ?" for k in values)
+            sql = f"UPDATE {table} SET {sets}{where}{returning}"
+            with _transaction(conn):
+                cur = conn.execute(sql, [_encode(self._columns[k], v) for k, v in values.items()] + params)
+                out = self._rows(cur) if returning else []
+            return Result(out, len(out) if returning else cur.rowcount)
+
+        if self._action == "delete":
+            with _transaction(conn):
+                cur = conn.execute(f"DELETE FROM {table}{where}{returning}", params)
+                out = self._rows(cur) if returning else []
+            return Result(out, len(out) if returning else cur.rowcount)
+
+        raise StoreError(f"Unsupported action: {self._action}")
+
+@contextmanager
+def _transaction(conn):
+    """连接处于 autocommit 模式，写操作显式 BEGIN IMMEDIATE，避免读后升级写锁的死锁；已在事务中 (RPC) 时直接复用"""
+    if conn.in_transaction:
+        yield
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try: yield
+    except:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _split_top(text):
+    """按顶层逗号切分 PostgREST 逻辑表达式 (忽略括号内的逗号)"""
+    parts, depth, buf = [], 0, ""
+    for ch in text:
+        if ch == "(": depth += 1
+        elif ch == ")": depth -= 1
+        if ch == "," and depth == 0:
+            parts.append(buf.strip()); buf = ""
+        else: buf += ch
+    if buf.strip(): parts.append(buf.strip())
+    return parts
+
+# ==========================================
+# 🧩 存储过程 (RPC)
+# ==========================================
+# 与 Supabase 上的同名 SQL 函数语义一致；整个函数在一个事务里执行
+RPC = {}
+
+def rpc(name):
+    def register(fn):
+        RPC[name] = fn
+        return fn
+    return register
+
+class _Rpc:
+    def __init__(self, client, fn, params):
+        self._client, self._fn, self._params = client, fn, params
+
+    def execute(self):
+        with _transaction(self._client.conn):
+            return Result(self._fn(self._client, **self._params))
+
+@rpc("msc_apply_radar_deltas")
+def _apply_radar_deltas(client, p_updates, p_alpha=None, p_axes=None):
+    """按顺序把每个 {username, scores} 融合进当前雷达；同一用户的多条增量依次叠加，每个用户只写一次"""
+    profiles = {}
+    for u in p_updates:
+        name = u['username']
+        if name not in profiles:
+            rows = client.table('users').select("radar_profile").eq('username', name).execute().data
+            if not rows: continue
+            profiles[name] = rows[0]['radar_profile']
+        profiles[name] = radar_codec.blend(profiles[name], u['scores'], p_alpha)
+    out = {}
+    for name, radar in profiles.items():
+        out[name] = radar_codec.encode(radar)
+        client.table('users').update({"radar_profile": out[name]}, returning="minimal").eq('username', name).execute()
+    return out
+
+@rpc("msc_node_counts")
+def _node_counts(client):
+    """{username: 未删除节点数 (热表 + 冷表)}"""
+    rows = client.conn.execute(
+        "SELECT username, COUNT(*) FROM (SELECT username FROM nodes WHERE is_deleted = 0 "
+        "UNION ALL SELECT username FROM nodes_archive WHERE is_deleted = 0) GROUP BY username"
+    ).fetchall()
+    return {username: n for username, n in rows}
+
+@rpc("msc_commit_turn")
+def _commit_turn(client, p_username, p_chats, p_node=None, p_radar_scores=None, p_alpha=None, p_axes=None):
+    chats = [{"username": p_username, "role": c['role'], "content": c['content'], "is_deleted": False} for c in p_chats]
+    chat_rows = client.table('chats').insert(chats).execute().data if chats else []
+    node_row = None
+    if p_node: node_row = client.table('nodes').insert(dict(p_node, username=p_username, is_deleted=False)).execute().data[0]
+    radar = None
+    if p_radar_scores: radar = _apply_radar_deltas(client, [{"username": p_username, "scores": p_radar_scores}], p_alpha).get(p_username)
+    return {"chats": chat_rows, "node": node_row, "radar_profile": radar}
+
+# ==========================================
+# 🔌 客户端 (Client)
+# ==========================================
+class SQLiteClient:
+    """每个客户端持有一个连接；由 msc_pool 保证同一时刻只被一个线程使用"""
+
+    def __init__(self, path):
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        create_schema(self.conn)
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params=None):
+        if name not in RPC: raise StoreError(f"Unknown rpc: {name}")
+        return _Rpc(self, RPC[name], params or {})
+
+    from_ = table
@@ -4,25 +4,19 @@ import json
 import random
 import numpy as np
 import msc_config as config
+import msc_vec as vec_codec
+import msc_radar as radar_codec
+import msc_node as node_model
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
+from sklearn.metrics import adjusted_rand_score
 
 # ==========================================
 # 🎨 1. 颜色与辅助工具
 # ==========================================
-def get_spectrum_color(keywords_str):
-    """根据关键词匹配光谱颜色"""
-    if not keywords_str: return "#607D8B" # Default: Nihilism
-    
-    # 优先精确匹配
-    for dim, color in config.SPECTRUM.items():
-        if dim in keywords_str: return color
-    
-    # 模糊匹配
-    for color in config.SPECTRUM.values():
-        if color in keywords_str: return color
-        
-    return "#607D8B"
+def get_spectrum_color(keywords):
+    """根据关键词匹配光谱颜色 (节点已在读取时算好 node.color，这里给其它来源的关键词用)"""
+    return node_model.spectrum_color(keywords)
 
 def get_cluster_color(cluster_id):
     """根据聚类ID获取颜色"""
@@ -54,31 +48,26 @@ def clean_for_json(obj):
 # ==========================================
 # 🧠 2. 聚类算法 (Clustering)
 # ==========================================
-def compute_clusters(nodes, n_clusters=5):
-    """计算节点的 3D 聚类坐标"""
-    raw_vectors = []
-    raw_meta = []
-    
-    for node in nodes:
-        if node['vector']:
-            try:
-                v = json.loads(node['vector'])
-                if isinstance(v, list) and len(v) > 0:
-                    raw_vectors.append(v)
-                    raw_meta.append({
-                        "care_point": node['care_point'],
-                        "insight": node.get('insight', ''),
-                        "id": str(node['id'])
-                    })
-            except: pass
-    
-    if not raw_vectors or len(raw_vectors) < 2: return pd.DataFrame()
+def compute_clusters(nodes, n_clusters=5, embeddings=None):
+    """
+    计算节点的 3D 聚类坐标
+    embeddings: 可选的常驻向量库 (msc_db.get_global_embeddings)，此时节点无需携带 vector 列
+    """
+    if embeddings is not None:
+        row_of = embeddings['row_of']
+        nodes = [n for n in nodes if n.id in row_of]
+        clean_vectors = vec_codec.dequantize(embeddings['index'], [row_of[n.id] for n in nodes])
+        rows = list(range(len(nodes)))
+    else:
+        nodes = [n for n in nodes if n.vector]
+        clean_vectors, rows = vec_codec.decode_matrix([n.vector for n in nodes])
+    if len(rows) < 2: return pd.DataFrame()
 
-    target_len = len(raw_vectors[0])
-    clean_vectors = [v for v in raw_vectors if len(v) == target_len]
-    clean_meta = [m for i, m in enumerate(raw_meta) if len(raw_vectors[i]) == target_len]
-    
-    if len(clean_vectors) < 2: return pd.DataFrame()
+    clean_meta = [{
+        "care_point": nodes[i].care_point,
+        "insight": nodes[i].insight,
+        "id": str(nodes[i].id)
+    } for i in rows]
 
     try:
         real_n_clusters = min(n_clusters, len(clean_vectors))
@@ -97,16 +86,49 @@ def compute_clusters(nodes, n_clusters=5):
         return df
     except: return pd.DataFrame()
 
+def quantization_report(matrix, precision, k=10, n_queries=100, n_clusters=5):
+    """
+    量化精度报告 (与 float32 全精度对比)
+    recall@k: 近邻检索的召回率；cluster_ari: KMeans 标签一致性；cos_err: 余弦相似度平均误差
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.shape[0] < max(k, n_clusters, 2): return {}
+    full = vec_codec.quantize(matrix, "float32")
+    quant = vec_codec.quantize(matrix, precision)
+
+    rng = np.random.default_rng(42)
+    queries = rng.choice(matrix.shape[0], size=min(n_queries, matrix.shape[0]), replace=False)
+    hits, cos_err = 0, 0.0
+    for q in queries:
+        exact = vec_codec.top_k_similar(full, matrix[q], k)
+        approx = vec_codec.top_k_similar(quant, matrix[q], k)
+        hits += len(np.intersect1d(exact, approx))
+        cos_err += float(np.abs(vec_codec.cosine_scores(full, matrix[q]) - vec_codec.cosine_scores(quant, matrix[q])).mean())
+
+    real_n_clusters = min(n_clusters, matrix.shape[0])
+    labels_full = KMeans(n_clusters=real_n_clusters, random_state=42, n_init=10).fit_predict(matrix)
+    labels_quant = KMeans(n_clusters=real_n_clusters, random_state=42, n_init=10).fit_predict(vec_codec.dequantize(quant))
+
+    return {
+        "precision": quant['precision'],
+        "vectors": int(matrix.shape[0]),
+        f"recall@{k}": round(hits / (len(queries) * k), 4),
+        "cos_err": round(cos_err / len(queries), 6),
+        "cluster_ari": round(float(adjusted_rand_score(labels_full, labels_quant)), 4),
+        "mb": round(vec_codec.nbytes(quant) / 1e6, 3),
+        "mb_float32": round(vec_codec.nbytes(full) / 1e6, 3)
+    }
+
 # ==========================================
 # 👻 3. 灵魂数据准备 (Soul Data)
 # ==========================================
-def prepare_soul_data(radar_dict, user_nodes):
-    """为 Soul Viz 准备渲染数据包"""
-    if not radar_dict: radar_dict = {"Care": 3.0, "Reflection": 3.0}
+def prepare_soul_data(radar_data, user_nodes):
+    """为 Soul Viz 准备渲染数据包；radar_data 为雷达数组 (或任意 msc_radar 可解码的格式)"""
+    vec, valid = radar_codec.decode(radar_data)
 
     # A. 维度解析
-    valid_keys = config.RADAR_AXES
-    clean_radar = {k: float(v) for k, v in radar_dict.items() if k in valid_keys and float(v) > 0}
+    if valid: clean_radar = {k: float(v) for k, v in zip(radar_codec.AXES, vec) if v > 0}
+    else: clean_radar = {"Care": 3.0, "Reflection": 3.0}
     if not clean_radar: clean_radar = {"Reflection": 5.0}
     
     sorted_dims = sorted(clean_radar.items(), key=lambda x: x[1], reverse=True)
@@ -124,18 +146,10 @@ def prepare_soul_data(radar_dict, user_nodes):
     # C. 思想节点数据 (Thoughts)
     thoughts_payload = []
     for node in user_nodes:
-        kw = node.get('keywords', [])
-        if isinstance(kw, str):
-            try: kw = json.loads(kw)
-            except: kw = []
-        
-        color = "#FFFFFF"
-        if kw:
-            for k in kw: 
-                if k in config.SPECTRUM: color = config.SPECTRUM[k]; break
+        color = next((config.SPECTRUM[k] for k in node.keywords if k in config.SPECTRUM), "#FFFFFF")
         
-        safe_content = node.get('care_point','?').replace('"', '&quot;')
-        safe_insight = node.get('insight', '').replace('"', '&quot;')
+        safe_content = (node.care_point or '?').replace('"', '&quot;')
+        safe_insight = node.insight.replace('"', '&quot;')
         
         thoughts_payload.append({
             "color": color,
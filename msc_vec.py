@@ -0,0 +1,127 @@
+import base64
+import json
+import numpy as np
+import msc_config as config
+
+# ==========================================
+# 🧬 向量编解码 (Embedding Codec)
+# ==========================================
+# 新格式: "b64f32:<base64>" / "b64f16:<base64>" (小端二进制)
+# 旧格式: str(list) 文本 "[0.1, 0.2, ...]" (与 pgvector 文本格式一致)，继续兼容
+DTYPES = {"float32": np.dtype('<f4'), "float16": np.dtype('<f2')}
+PREFIXES = {"float32": "b64f32:", "float16": "b64f16:"}
+PREFIX_DTYPES = {PREFIXES[k]: DTYPES[k] for k in DTYPES}
+PREFIX_LEN = 7
+
+def encode_vector(vector, dtype=None):
+    """把 embedding 编码成紧凑的 base64 字符串"""
+    dtype = dtype or config.EMBEDDING_DTYPE
+    arr = np.asarray(vector, dtype=DTYPES[dtype])
+    return PREFIXES[dtype] + base64.b64encode(arr.tobytes()).decode('ascii')
+
+def _decode_raw(raw):
+    """返回 1-D 数组 (二进制格式零拷贝视图)；无法解析时返回 None"""
+    if raw is None: return None
+    if isinstance(raw, (list, tuple, np.ndarray)): return np.asarray(raw, dtype=np.float32)
+    if not isinstance(raw, str) or not raw: return None
+    dtype = PREFIX_DTYPES.get(raw[:PREFIX_LEN])
+    if dtype is not None:
+        try: return np.frombuffer(base64.b64decode(raw[PREFIX_LEN:]), dtype=dtype)
+        except: return None  # 截断 / 损坏的 base64 或字节数不是 dtype 的整数倍
+    try:
+        arr = np.fromstring(raw.strip().strip('[]'), dtype=np.float32, sep=',')
+        if arr.size: return arr
+    except: pass
+    try: return np.asarray(json.loads(raw), dtype=np.float32)
+    except: return None
+
+def decode_vector(raw):
+    vec = _decode_raw(raw)
+    if vec is None or vec.ndim != 1 or vec.size == 0: return None
+    return vec.astype(np.float32, copy=False)
+
+def decode_matrix(raws, dim=None):
+    """
+    批量解码到预分配的 float32 矩阵
+    dim 为空时以第一个有效向量的长度为准；长度不符的行被跳过
+    返回: (matrix[n_valid, dim], rows) —— rows 是每一行在输入中的下标
+    """
+    matrix = None
+    rows = []
+    for i, raw in enumerate(raws):
+        vec = _decode_raw(raw)
+        if vec is None or vec.ndim != 1 or vec.size == 0: continue
+        if matrix is None:
+            dim = dim or vec.size
+            matrix = np.empty((len(raws), dim), dtype=np.float32)
+        if vec.size != dim: continue
+        matrix[len(rows)] = vec
+        rows.append(i)
+    if matrix is None: return np.empty((0, dim or 0), dtype=np.float32), []
+    return matrix[:len(rows)], rows
+
+# ==========================================
+# 🗜️ 量化 (float16 / 每向量缩放 int8)
+# ==========================================
+PRECISIONS = ("float32", "float16", "int8")
+SCORE_BLOCK = 4096  # 分块计算相似度，避免 int8 整体上转 float32 的内存峰值
+
+def quantize(matrix, precision="float32"):
+    """
+    返回量化矩阵: {"precision", "data", "scales", "norms"}
+    int8: 每个向量单独缩放 (scale = max|x| / 127)
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1).astype(np.float32) if matrix.size else np.empty(0, np.float32)
+    scales = None
+    if precision == "float16":
+        data = matrix.astype(np.float16)
+    elif precision == "int8":
+        scales = (np.abs(matrix).max(axis=1) / 127.0).astype(np.float32) if matrix.size else np.empty(0, np.float32)
+        scales[scales == 0] = 1.0
+        data = np.rint(matrix / scales[:, None]).astype(np.int8)
+    else:
+        precision, data = "float32", matrix
+    return {"precision": precision, "data": data, "scales": scales, "norms": norms}
+
+def append(qm, matrix):
+    """在末尾追加若干行 (同一精度)，返回新的量化矩阵；原对象不变，正在读取它的调用方不受影响"""
+    extra = quantize(matrix, qm['precision'])
+    return {
+        "precision": qm['precision'],
+        "data": np.concatenate([qm['data'], extra['data']]),
+        "scales": None if qm['scales'] is None else np.concatenate([qm['scales'], extra['scales']]),
+        "norms": np.concatenate([qm['norms'], extra['norms']])
+    }
+
+def dequantize(qm, rows=None):
+    data = qm['data'] if rows is None else qm['data'][rows]
+    out = data.astype(np.float32)
+    if qm['scales'] is not None:
+        out *= (qm['scales'] if rows is None else qm['scales'][rows])[:, None]
+    return out
+
+def nbytes(qm):
+    return sum(a.nbytes for a in (qm['data'], qm['scales'], qm['norms']) if a is not None)
+
+def cosine_scores(qm, query):
+    """query 与所有向量的余弦相似度 (直接在量化数据上分块计算)"""
+    query = np.asarray(query, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    data, scales = qm['data'], qm['scales']
+    scores = np.empty(data.shape[0], dtype=np.float32)
+    for start in range(0, data.shape[0], SCORE_BLOCK):
+        end = start + SCORE_BLOCK
+        dots = data[start:end].astype(np.float32) @ query
+        if scales is not None: dots *= scales[start:end]
+        scores[start:end] = dots
+    norms = qm['norms']
+    return scores / np.where(norms > 0, norms, 1.0)
+
+def top_k_similar(qm, query, k=10):
+    """最相似的 k 个行下标 (降序)"""
+    scores = cosine_scores(qm, query)
+    k = min(k, scores.size)
+    if k <= 0: return np.empty(0, dtype=np.intp)
+    idx = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(scores.size)
+    return idx[np.argsort(-scores[idx], kind='stable')]
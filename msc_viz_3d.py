@@ -15,15 +15,9 @@ def dim_color(hex_color, factor=0.5):
         return '#{:02x}{:02x}{:02x}'.format(r, g, b)
     except: return "#444444"
 
-def get_location_data(node_data):
-    loc = None
-    try:
-        if isinstance(node_data.get('location'), str): loc = json.loads(node_data['location'])
-        elif isinstance(node_data.get('location'), dict): loc = node_data['location']
-    except: pass
-    
-    if not loc or not loc.get('lat'): return trans.get_random_coordinate()
-    return loc.get('lat'), loc.get('lon')
+def get_location_data(node):
+    """节点位置 (读取时已解码)；没有位置的节点随机落在海洋上"""
+    return node.lat_lon or trans.get_random_coordinate()
 
 def render_3d_particle_map(nodes, current_user):
     if not nodes:
@@ -35,26 +29,26 @@ def render_3d_particle_map(nodes, current_user):
     rings_data = []
     
     for node in nodes:
-        raw_color = trans.get_spectrum_color(str(node.get('keywords', '')))
-        mode = node.get('mode', 'Active')
+        raw_color = node.color
+        mode = node.mode
         lat, lon = get_location_data(node)
         
         if mode == 'Sediment':
             ground_data.append({
                 "lat": lat, "lng": lon, "alt": 0.0, "radius": 0.2,
-                "color": dim_color(raw_color, 0.4), "label": f"History: {node['care_point']}"
+                "color": dim_color(raw_color, 0.4), "label": f"History: {node.care_point}"
             })
         else:
-            if node['username'] != current_user:
+            if node.username != current_user:
                 ground_data.append({
                     "lat": lat, "lng": lon, "alt": 0.005, "radius": 0.6,
-                    "color": raw_color, "label": f"Light: {node['care_point']}"
+                    "color": raw_color, "label": f"Light: {node.care_point}"
                 })
             else:
                 altitude = random.uniform(0.15, 0.4)
                 satellite_data.append({
                     "lat": lat, "lng": lon, "alt": altitude, "radius": 0.6,
-                    "color": raw_color, "label": f"ME: {node['care_point']}"
+                    "color": raw_color, "label": f"ME: {node.care_point}"
                 })
                 rings_data.append({
                     "lat": lat, "lng": lon, "alt": altitude, "color": raw_color,
@@ -3,6 +3,7 @@ import pandas as pd
 import json
 import random
 import msc_config as config
+import msc_vec as vec_codec
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA
 
@@ -45,29 +46,16 @@ def get_random_coordinate():
 # 🧠 聚类算法 (Clustering)
 # ==========================================
 def compute_clusters(nodes, n_clusters=5):
-    raw_vectors = []
-    raw_meta = []
-    
-    for node in nodes:
-        if node['vector']:
-            try:
-                v = json.loads(node['vector'])
-                if isinstance(v, list) and len(v) > 0:
-                    raw_vectors.append(v)
-                    raw_meta.append({
-                        "care_point": node['care_point'],
-                        "insight": node.get('insight', ''),
-                        "id": str(node['id'])
-                    })
-            except: pass
-    
-    if not raw_vectors or len(raw_vectors) < 2: return pd.DataFrame()
+    # 向量解码统一走 msc_vec (兼容 base64 二进制与旧的文本格式)
+    nodes = [n for n in nodes if n.get('vector')]
+    clean_vectors, rows = vec_codec.decode_matrix([n['vector'] for n in nodes])
+    if len(rows) < 2: return pd.DataFrame()
 
-    target_len = len(raw_vectors[0])
-    clean_vectors = [v for v in raw_vectors if len(v) == target_len]
-    clean_meta = [m for i, m in enumerate(raw_meta) if len(raw_vectors[i]) == target_len]
-    
-    if len(clean_vectors) < 2: return pd.DataFrame()
+    clean_meta = [{
+        "care_point": nodes[i]['care_point'],
+        "insight": nodes[i].get('insight', ''),
+        "id": str(nodes[i]['id'])
+    } for i in rows]
 
     try:
         real_n_clusters = min(n_clusters, len(clean_vectors))
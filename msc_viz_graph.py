@@ -4,15 +4,14 @@ from streamlit_echarts import st_echarts
 import json
 import msc_transformer as trans # <--- 变动在这里
 import msc_lib as msc 
+import msc_radar as radar_codec
 
 # ==========================================
 # 🕸️ 1. 雷达图 (Radar)
 # ==========================================
-def render_radar_chart(radar_dict, height="200px"):
-    keys = ["Care", "Curiosity", "Reflection", "Coherence", "Agency", "Aesthetic", "Transcendence"]
-    safe_scores = []
-    for k in keys:
-        safe_scores.append(radar_dict.get(k, 3.0))
+def render_radar_chart(radar_data, height="200px"):
+    keys = list(radar_codec.AXES)
+    safe_scores = radar_codec.to_vector(radar_data).tolist()
 
     option = {
         "backgroundColor": "transparent", 
@@ -34,35 +33,34 @@ def render_radar_chart(radar_dict, height="200px"):
 # ==========================================
 # 🔮 2. 赛博朋克关系图 (Network Graph)
 # ==========================================
-def render_cyberpunk_map(nodes, height="250px", is_fullscreen=False, key_suffix="map"):
+def render_cyberpunk_map(nodes, height="250px", is_fullscreen=False, key_suffix="map", embeddings=None):
     if not nodes: return None
     
     # 使用新文件的方法
-    cluster_df = trans.compute_clusters(nodes, n_clusters=5)
+    cluster_df = trans.compute_clusters(nodes, n_clusters=5, embeddings=embeddings)
     id_to_color = {}
     default_color = "#00fff2"
     
     if not cluster_df.empty:
-        for i, color in enumerate(cluster_df['color']):
-            if i < len(nodes): id_to_color[str(nodes[i]['id'])] = color
+        id_to_color = dict(zip(cluster_df['id'], cluster_df['color']))
 
     graph_nodes, graph_links = [], []
     symbol_base = 30 if is_fullscreen else 15
     
     for i, node in enumerate(nodes):
-        logic = node.get('logic_score') or 0.5
-        nid = str(node['id'])
+        logic = node.logic_score or 0.5
+        nid = str(node.id)
         node_color = id_to_color.get(nid, default_color)
-        label_text = node['care_point']
+        label_text = node.care_point
         if len(label_text) > 6: label_text = label_text[:5] + "..."
 
         graph_nodes.append({
             "name": nid, "id": nid, "symbolSize": symbol_base * (0.8 + logic),
-            "value": node['care_point'], 
+            "value": node.care_point, 
             "label": {"show": is_fullscreen, "formatter": label_text, "color": "#fff", "fontSize": 10},
             "full_data": {
-                "insight": node.get('insight', ''), "content": node['content'], 
-                "layer": node.get('meaning_layer', ''), "username": node['username']
+                "insight": node.insight, "content": node.content, 
+                "layer": node.meaning_layer, "username": node.username
             },
             "itemStyle": {"color": node_color}
         })
@@ -122,21 +120,20 @@ def view_fullscreen_map(nodes, user_name):
     viz_facade.render_spectrum_legend()
 
 @st.dialog("🧬 MSC 深度基因解码", width="large")
-def view_radar_details(radar_dict, username):
+def view_radar_details(radar_data, username):
+    vec = radar_codec.to_vector(radar_data)
     c1, c2 = st.columns([1, 1])
-    with c1: render_radar_chart(radar_dict, height="350px")
+    with c1: render_radar_chart(vec, height="350px")
     with c2:
         st.markdown(f"### {username} 的核心参数")
-        required_keys = ["Care", "Curiosity", "Reflection", "Coherence", "Agency", "Aesthetic", "Transcendence"]
-        for key in required_keys:
-            val = radar_dict.get(key, 3.0)
+        for key, val in zip(radar_codec.AXES, vec.tolist()):
             st.progress(val / 10, text=f"**{key}**: {val}")
             
     st.divider()
-    report_key = f"report_{username}_{sum(radar_dict.values())}"
+    report_key = f"report_{username}_{round(float(vec.sum()), 2)}"
     if report_key not in st.session_state:
         with st.spinner("Analyzing..."):
-            report = msc.analyze_persona_report(radar_dict)
+            report = msc.analyze_persona_report(vec)
             st.session_state[report_key] = report
     report = st.session_state[report_key]
     with st.container(border=True):
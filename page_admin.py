@@ -8,13 +8,18 @@ import time
 import pandas as pd
 import json
 import msc_db as db 
+import msc_config as config
+import msc_vec as vec_codec
+import msc_transformer as trans
 
 def render_admin_dashboard():
     st.markdown("## 👁️ Overseer Terminal")
     st.caption("v75.5 Arrival / System Status: ONLINE")
     
     all_users = msc.get_all_users("admin")
-    global_nodes = msc.get_global_nodes() 
+    # 聚类图需要向量：量化模式下使用常驻向量库，否则随节点一起读取
+    use_embedding_store = config.EMBEDDING_PRECISION != "float32"
+    global_nodes = msc.get_global_nodes(with_vectors=not use_embedding_store)
     
     # === 📊 数据预处理 ===
     user_stats = {}
@@ -26,21 +31,19 @@ def render_admin_dashboard():
     
     if global_nodes:
         for n in global_nodes:
-            un = n['username']
+            un = n.username
+            score = n.logic_score or 0.0
             if un in user_stats:
                 user_stats[un]['nodes'] += 1
-                try: user_stats[un]['total_score'] += float(n.get('logic_score', 0))
-                except: pass
-            
-            created_time = n.get('created_at', '')[:16].replace('T', ' ')
+                user_stats[un]['total_score'] += score
             
             node_stream_data.append({
-                "Time": created_time,
+                "Time": n.created_label,
                 "User": un,
-                "Care Point": n.get('care_point', '-'),
-                "Full Content": n.get('content', ''), 
-                "Score": round(float(n.get('logic_score', 0)), 2),
-                "Insight": n.get('insight', '-')
+                "Care Point": n.care_point or '-',
+                "Full Content": n.content, 
+                "Score": round(score, 2),
+                "Insight": n.insight or '-'
             })
 
     rich_user_data = []
@@ -58,12 +61,12 @@ def render_admin_dashboard():
     
     # === 顶部指标 ===
     k1, k2, k3, k4 = st.columns(4)
-    k1.metric("Citizens", len(all_users))
-    k2.metric("Nodes", len(global_nodes))
+    k1.metric("Citizens", msc.count_users())
+    k2.metric("Nodes", msc.count_nodes(estimated=True, include_archive=True))
     
     avg_sys_care = 0
     if global_nodes:
-        total = sum([float(n.get('logic_score', 0)) for n in global_nodes])
+        total = sum([n.logic_score or 0.0 for n in global_nodes])
         avg_sys_care = total / len(global_nodes)
     k3.metric("Avg. Meaning", f"{avg_sys_care:.2f}")
     k4.metric("Engine", "Active")
@@ -142,13 +145,24 @@ def render_admin_dashboard():
     with tabs[2]:
         st.markdown("#### 🌍 Network Topology")
         # 传递 key_suffix="admin_map"
-        clicked_data = viz.render_cyberpunk_map(global_nodes, height="600px", is_fullscreen=False, key_suffix="admin_map")
+        embeddings = msc.get_global_embeddings() if use_embedding_store else None
+        clicked_data = viz.render_cyberpunk_map(global_nodes, height="600px", is_fullscreen=False, key_suffix="admin_map", embeddings=embeddings)
         
         if clicked_data:
             st.divider()
             st.info(f"**Selected Node**: {clicked_data.get('content', 'Unknown')}")
             st.caption(f"User: {clicked_data.get('username')} | Insight: {clicked_data.get('insight')}")
 
+        with st.expander("🗜️ Embedding Quantization Report", expanded=False):
+            st.caption(f"Current precision: {config.EMBEDDING_PRECISION}")
+            if st.button("Measure (float16 / int8 vs float32)"):
+                with st.spinner("Measuring..."):
+                    matrix, _ = vec_codec.decode_matrix([n.vector for n in msc.get_global_nodes(with_vectors=True)])
+                    reports = [trans.quantization_report(matrix, p) for p in ("float16", "int8")]
+                    reports = [r for r in reports if r]
+                if reports: st.dataframe(pd.DataFrame(reports), use_container_width=True, hide_index=True)
+                else: st.caption("Not enough vectors to measure.")
+
     # === Tab 4: 模拟器 ===
     with tabs[3]:
         c_gen1, c_gen2 = st.columns(2)
@@ -185,7 +199,7 @@ def render_admin_dashboard():
                 r_care = st.slider("Care", 1, 10, 5, help="Tendency to nurture")
                 r_agency = st.slider("Agency", 1, 10, 5, help="Will to power")
                 r_reflection = st.slider("Reflection", 1, 10, 5, help="Depth of thought")
-                r_empathy = st.slider("Empathy", 1, 10, 5, help="Resonance with others")
+                r_transcendence = st.slider("Transcendence", 1, 10, 5, help="Reach beyond the self")
             
             if st.button("🧬 Fabricate Custom Soul", use_container_width=True):
                 if new_name:
@@ -193,9 +207,9 @@ def render_admin_dashboard():
                     if msc.add_user(uname, "123456", new_name, new_city):
                         custom_radar = {
                             "Care": r_care, "Agency": r_agency, "Reflection": r_reflection,
-                            "Empathy": r_empathy, "Curiosity": 5, "Coherence": 5, "Aesthetic": 5
+                            "Transcendence": r_transcendence, "Curiosity": 5, "Coherence": 5, "Aesthetic": 5
                         }
-                        msc.update_radar_score(uname, json.dumps(custom_radar))
+                        msc.update_radar_score(uname, custom_radar)
                         st.success(f"Identity {new_name} created successfully.")
                         time.sleep(1)
                         st.rerun()
@@ -206,7 +220,19 @@ def render_admin_dashboard():
 
     # === Tab 5: 日志 ===
     with tabs[4]:
+        with st.container(border=True):
+            st.markdown("#### 🧊 Maintenance")
+            c_decay, c_archive = st.columns(2)
+            if c_decay.button("⏳ Run Time Decay", use_container_width=True):
+                st.caption(f"Decay: {msc.process_time_decay()}")
+            if c_archive.button("🧊 Archive Sediment", use_container_width=True):
+                st.caption(f"Archive: {msc.archive_sediment_nodes()}")
         if st.button("Refresh Logs"): st.rerun()
+        st.caption(f"Log pipeline: {msc.get_log_pipeline_stats()}")
+        st.caption(f"DB pool: {msc.get_db_pool_stats()}")
+        st.caption(f"Request memo: {msc.get_request_stats()}")
+        st.caption(f"Push: {msc.get_push_stats()}")
+        st.caption(f"Presence: {msc.get_presence_stats()}")
         try:
             logs = msc.get_system_logs(limit=50)
             if logs: st.dataframe(pd.DataFrame(logs), use_container_width=True)
@@ -2,14 +2,14 @@ import streamlit as st
 import msc_lib as msc
 import time
 import msc_i18n as i18n
+import msc_config as config
 import random  # 🟢 新增：为了随机抽取提示语
 
 # ==========================================
 # 🧠 核心逻辑：第一张意义卡提示 (静默版)
 # ==========================================
 def check_first_meaning_card_silent(username):
-    nodes = msc.get_active_nodes_map(username)
-    if len(nodes) == 1:
+    if msc.count_nodes(username) == 1:
         lang = st.session_state.get('language', 'en')
         if lang == 'zh':
             msg = """刚刚那句话，被我们留下来了。\n\n在这里，它被称为一张「意义卡」。\n\n意义卡不是观点，也不是结论，而是你真正认真思考过的痕迹。\n\n解锁更多的意义卡，你会看到更多与世界互动的方式。不是被推送，而是从你自己出发。"""
@@ -39,6 +39,37 @@ PLACEHOLDERS_EN = [
     "Just reflect on your thoughts...",
 ]
 
+# ==========================================
+# 📜 对话历史 (缓存尾部 + 按需加载更早)
+# ==========================================
+def _load_chat_view(username):
+    """首次进入取缓存尾部；之后只追加尾部中 last_id 之后的新消息"""
+    key = f"chat_view_{username}"
+    tail = msc.get_active_chats(username)
+    view = st.session_state.get(key)
+    if view is None:
+        view = {"msgs": list(tail), "has_more": len(tail) >= config.CHAT_PAGE_SIZE}
+        st.session_state[key] = view
+        return view
+    last_id = view["msgs"][-1]['id'] if view["msgs"] else 0
+    if view["msgs"] and tail and tail[0]['id'] > last_id:
+        # 尾部已整体越过 last_id，中间可能有缺口，从库里补齐
+        while True:
+            new = msc.get_chat_page(username, after_id=last_id)
+            view["msgs"].extend(new)
+            if len(new) < config.CHAT_PAGE_SIZE: break
+            last_id = new[-1]['id']
+    else:
+        view["msgs"].extend(m for m in tail if m['id'] > last_id)
+    return view
+
+def _load_older_chats(username):
+    view = st.session_state.get(f"chat_view_{username}")
+    if not view or not view["msgs"]: return
+    older = msc.get_chat_page(username, before_id=view["msgs"][0]['id'])
+    view["msgs"] = older + view["msgs"]
+    view["has_more"] = len(older) >= config.CHAT_PAGE_SIZE
+
 # ==========================================
 # 🤖 AI 页面渲染 (流畅优化版)
 # ==========================================
@@ -46,7 +77,10 @@ def render_ai_page(username):
     st.markdown("<div style='height: 20px;'></div>", unsafe_allow_html=True)
     
     # 1. 读取数据
-    chat_history = msc.get_active_chats(username)
+    view = _load_chat_view(username)
+    chat_history = view["msgs"]
+    if view["has_more"]:
+        st.button("⬆ Load older", key="chat_older", on_click=_load_older_chats, args=(username,), use_container_width=True)
     nodes_map = msc.get_active_nodes_map(username)
     lang = st.session_state.get('language', 'en')
     
@@ -64,11 +98,9 @@ def render_ai_page(username):
                 if node:
                     st.markdown('<div class="meaning-dot-btn">', unsafe_allow_html=True)
                     with st.popover("●", help="Meaning Extracted"):
-                        try: score_val = float(node.get('logic_score') or 0.5)
-                        except: score_val = 0.5
-                        st.caption(f"Meaning Score: {score_val:.2f}")
-                        st.markdown(f"**{node.get('care_point', 'Unknown')}**")
-                        st.info(node.get('insight', 'No insight'))
+                        st.caption(f"Meaning Score: {node.logic_score or 0.5:.2f}")
+                        st.markdown(f"**{node.care_point or 'Unknown'}**")
+                        st.info(node.insight or 'No insight')
                     st.markdown('</div>', unsafe_allow_html=True)
 
     # 3. 输入框逻辑 (🟢 修改点)
@@ -86,29 +118,33 @@ def render_ai_page(username):
         full_history = chat_history + [{'role':'user', 'content':prompt}]
         
         # B. AI 流式回复
+        full_response = None
         with st.chat_message("assistant"):
             try:
                 response_stream = msc.get_stream_response(full_history)
                 full_response = st.write_stream(response_stream)
-                
-                # 存入数据库
-                msc.save_chat(username, "user", prompt)
-                msc.save_chat(username, "assistant", full_response)
             except Exception as e:
                 st.error(f"AI Error: {e}")
 
+        # 对话先落库：后面的分析 / 向量化还要两次网络调用，期间离开页面或出错都不能丢掉这一轮
+        if full_response: msc.commit_turn(username, prompt, full_response)
+
         # C. 背景分析 (Silent Analysis)
         status_msg = "Capturing meaning..." if lang == 'en' else "正在捕获思维深度..."
         st.toast(status_msg, icon="🧬")
         
         # 这一行会触发 msc_lib.py 里的函数
-        analysis = msc.analyze_meaning_background(prompt)
+        try:
+            analysis = msc.analyze_meaning_background(prompt)
+            vec = msc.get_embedding(prompt) if analysis.get("valid", False) else None
+        except Exception as e:
+            print(f"Analysis Error: {e}")
+            analysis, vec = {"valid": False}, None
+
+        # D. 意义节点 + 雷达：第二次提交 (同一事务)
+        ok = False
+        if analysis.get("valid", False): ok, _ = msc.commit_turn(username, prompt, None, analysis, vec, "AI对话")
         
-        if analysis.get("valid", False):
-            vec = msc.get_embedding(prompt)
-            msc.save_node(username, prompt, analysis, "AI对话", vec)
-            if "radar_scores" in analysis: 
-                msc.update_radar_score(username, analysis["radar_scores"])
-            
+        if ok:
             st.toast("Meaning Node Created" if lang == 'en' else "意义节点已生成", icon="✅")
             check_first_meaning_card_silent(username)
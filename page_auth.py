@@ -210,8 +210,8 @@ def render_onboarding(username):
             if st.button(f">> {i18n.get_text('s3_btn')}", use_container_width=False):
                 # 初始化默认雷达数据
                 msc.update_radar_score(username, {
-                    "Reflection": 5.0, "Rationality": 5.0, "Curiosity": 5.0,
-                    "Agency": 5.0, "Empathy": 5.0, "Care": 5.0, "Transcendence": 3.0
+                    "Reflection": 5.0, "Curiosity": 5.0,
+                    "Agency": 5.0, "Care": 5.0, "Transcendence": 3.0
                 })
                 st.session_state.onboarding_complete = True
                 st.rerun()
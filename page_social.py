@@ -139,18 +139,103 @@ def render_scan_dialog(username):
         time.sleep(1.5)
         st.rerun()
 
+# ==========================================
+# 💬 私信会话 (按 id 增量加载)
+# ==========================================
+def _latest_page(username, partner):
+    msgs = msc.get_direct_messages(username, partner)
+    return {"msgs": msgs, "has_more": len(msgs) >= config.DM_PAGE_SIZE}
+
+def _load_conversation(username, partner, refresh=True):
+    """
+    首次进入 (或还没有任何消息可作游标) 取最新一页；之后只在 refresh 时拉取 last_id 之后的新消息
+    追赶最多 DM_CATCHUP_PAGES 页，仍未追上就直接换成最新一页 (更早的消息用 Load older 补)
+    """
+    key = f"dm_{username}_{partner}"
+    conv = st.session_state.get(key)
+    if conv is None or (refresh and not conv["msgs"]):
+        conv = st.session_state[key] = _latest_page(username, partner)
+        return conv
+    for _ in range(config.DM_CATCHUP_PAGES if refresh else 0):
+        new = msc.get_direct_messages(username, partner, after_id=conv["msgs"][-1]['id'])
+        conv["msgs"].extend(new)
+        if len(new) < config.DM_PAGE_SIZE: break
+    else:
+        if refresh: conv = st.session_state[key] = _latest_page(username, partner)
+    return conv
+
+def _load_older(username, partner):
+    conv = st.session_state.get(f"dm_{username}_{partner}")
+    if not conv or not conv["msgs"]: return
+    older = msc.get_direct_messages(username, partner, before_id=conv["msgs"][0]['id'])
+    conv["msgs"] = older + conv["msgs"]
+    conv["has_more"] = len(older) >= config.DM_PAGE_SIZE
+
+@st.fragment(run_every=config.PUSH_POLL_SECONDS)
+def _chat_pane(username):
+    """
+    只重跑聊天面板：先在本地 Hub (内存) 里查推送事件，没有相关事件时不访问数据库
+    好友请求 / 其它人的新私信需要刷新左侧列表和未读数 → 整页重跑
+    推送不可用时没有事件来源：每 PUSH_FALLBACK_SECONDS 整页重跑一次 (整页会增量同步收件箱)
+    """
+    if not msc.is_push_live() and time.time() - st.session_state.get("page_synced_at", 0) > config.PUSH_FALLBACK_SECONDS:
+        st.rerun()
+
+    box = st.session_state.get("inbox") or {}
+    since = st.session_state.get("push_cursor", box.get("push_cursor", 0))
+    cursor, events = msc.poll_push(username, since)
+    st.session_state.push_cursor = cursor
+    partner = st.session_state.current_chat_partner
+    synced = box.get("push_cursor", 0)  # 这之前的事件已经包含在本次整页的收件箱同步里
+    if events is None or any(
+        e['seq'] > synced and (e['kind'] == 'friend_request' or (e['receiver'] == username and e['sender'] != partner))
+        for e in events
+    ):
+        st.rerun()
+
+    if not partner:
+        st.info(i18n.get_text('chat_sel'))
+        return
+
+    pair = {username, partner}
+    incoming = [e for e in events if e['kind'] == 'dm' and {e['sender'], e['receiver']} == pair]
+    if any(e['sender'] == partner for e in incoming): msc.mark_messages_read(partner, username)
+
+    st.markdown(f"#### ⚡ {partner}") 
+    refresh = bool(incoming)
+    if not refresh and not msc.is_push_live():  # 推送不可用：退回低频轮询
+        refresh = time.time() - st.session_state.get("dm_polled_at", 0) > config.PUSH_FALLBACK_SECONDS
+    if refresh: st.session_state.dm_polled_at = time.time()
+    conv = _load_conversation(username, partner, refresh=refresh)
+    history = conv["msgs"]
+    my_nodes = msc.get_active_nodes_map(username)
+
+    with st.container(height=600, border=True):
+        if conv["has_more"]:
+            st.button("⬆ Load older", key=f"older_{partner}", on_click=_load_older, args=(username, partner), use_container_width=True)
+        if not history:
+            st.markdown(f"<div style='text-align:center; color:#ccc; margin-top:50px;'>链路已建立。现在，你们可以开始交换意义了。</div>", unsafe_allow_html=True)
+        for msg in history:
+            c_msg, c_dot = st.columns([0.94, 0.06])
+            with c_msg:
+                if msg['sender'] == username:
+                    st.markdown(f"<div class='chat-bubble-me'>{msg['content']}</div>", unsafe_allow_html=True)
+                else:
+                    st.markdown(f"<div class='chat-bubble-other'>{msg['content']}</div>", unsafe_allow_html=True)
+            if msg['sender'] == username and msg['content'] in my_nodes:
+                node = my_nodes.get(msg['content'])
+                if node:
+                    st.markdown('<div class="meaning-dot-btn">●</div>', unsafe_allow_html=True)
+
+    if prompt := st.chat_input(f"Transmit to {partner}..."):
+        msc.send_direct_message(username, partner, prompt)  # 发布到 Hub，下一轮立即拉取
+        st.rerun(scope="fragment")
+
 # ==========================================
 # 💬 Main Page
 # ==========================================
-def render_friends_page(username, unread_counts):
-    try:
-        from streamlit_autorefresh import st_autorefresh
-        st_autorefresh(interval=10000, key="msg_refresh") 
-    except: pass
-    
-    msc.update_heartbeat(username)
-    all_nodes = msc.get_all_nodes_for_map(username)
-    node_count = len(all_nodes)
+def render_friends_page(username, inbox):
+    node_count = msc.count_nodes(username, include_archive=True)
     
     # 🟢 阈值检查与升空动画 (双重检查)
     if node_count >= config.WORLD_UNLOCK_THRESHOLD and not st.session_state.is_admin:
@@ -180,7 +265,7 @@ def render_friends_page(username, unread_counts):
         st.divider()
 
         # 🟢 B. 待处理请求
-        pending = msc.get_pending_requests(username)
+        pending = inbox["pending"]
         if pending:
             st.caption(f"Incoming: {len(pending)}")
             for req in pending:
@@ -198,7 +283,7 @@ def render_friends_page(username, unread_counts):
             st.divider()
 
         # 🟢 C. 好友列表
-        friends = msc.get_my_friends(username)
+        friends = inbox["friends"]
         
         if friends:
             menu_items = []
@@ -206,7 +291,7 @@ def render_friends_page(username, unread_counts):
             for f in friends:
                 fname = f['username']
                 user_map[fname] = fname 
-                unread = unread_counts.get(fname, 0)
+                unread = inbox["unread"].get(fname, 0)
                 tag = sac.Tag(str(unread), color='red') if unread > 0 else None
                 desc = (f['metaphor'][:15] + '..') if f['metaphor'] else "Connected"
                 menu_items.append(sac.MenuItem(label=fname, description=desc, icon='person-fill', tag=tag))
@@ -218,32 +303,9 @@ def render_friends_page(username, unread_counts):
 
     with col_chat:
         partner = st.session_state.current_chat_partner
-        if partner:
-            msc.mark_messages_read(partner, username)
-            st.markdown(f"#### ⚡ {partner}") 
-            history = msc.get_direct_messages(username, partner)
-            my_nodes = msc.get_active_nodes_map(username)
-
-            with st.container(height=600, border=True):
-                if not history:
-                    st.markdown(f"<div style='text-align:center; color:#ccc; margin-top:50px;'>链路已建立。现在，你们可以开始交换意义了。</div>", unsafe_allow_html=True)
-                for msg in history:
-                    c_msg, c_dot = st.columns([0.94, 0.06])
-                    with c_msg:
-                        if msg['sender'] == username:
-                            st.markdown(f"<div class='chat-bubble-me'>{msg['content']}</div>", unsafe_allow_html=True)
-                        else:
-                            st.markdown(f"<div class='chat-bubble-other'>{msg['content']}</div>", unsafe_allow_html=True)
-                    if msg['sender'] == username and msg['content'] in my_nodes:
-                        node = my_nodes.get(msg['content'])
-                        if node:
-                            st.markdown('<div class="meaning-dot-btn">●</div>', unsafe_allow_html=True)
-
-            if prompt := st.chat_input(f"Transmit to {partner}..."):
-                msc.send_direct_message(username, partner, prompt)
-                st.rerun()
-        else:
-            st.info(i18n.get_text('chat_sel'))
+        if partner and inbox["unread"].get(partner): msc.mark_messages_read(partner, username)
+        st.session_state.page_synced_at = time.time()  # 本次整页运行已同步收件箱
+        _chat_pane(username)
 
 # ==========================================
 # 🌍 2. 世界页面